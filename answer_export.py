@@ -0,0 +1,186 @@
+"""
+答案匯出
+
+將解析卷的題目直接串流輸出為 JSONL、CSV 或精簡的欄式二進位檔，
+不需要解答卷模板，也不建立 python-docx 文件物件，適合只需要答案的下游系統。
+
+    python answer_export.py --format jsonl -o answers.jsonl 解析卷1.doc 解析卷2.docx
+    python answer_export.py --format csv -o - 解析卷.doc
+    python answer_export.py --format columnar -o answers.wfqc 解析卷/*.doc
+"""
+
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+import zlib
+from typing import Dict, Iterator, List, Tuple
+
+from docx_text import read_docx_text
+
+FIELDS = ('source', 'number', 'answer', 'explanation')
+
+# 欄式檔案格式：檔頭後接多個列群組，每個群組內各欄位分別壓縮
+COLUMNAR_MAGIC = b'WFQCOL1\n'
+COLUMNAR_GROUP_SIZE = 4096
+
+
+def extract_source_text(filler, path: str) -> str:
+    """讀取解析卷全文：.doc 使用轉換工具，.docx 直接串流讀取 XML"""
+    if path.lower().endswith('.doc'):
+        return filler._read_doc_file(path)
+    return read_docx_text(path)
+
+
+def iter_records(paths: List[str]) -> Iterator[Dict[str, str]]:
+    """逐份解析並產生題目紀錄，同一時間只保留一份解析卷的結果"""
+    from word_form_filler_doc import HeadlessWordFormFiller
+
+    filler = HeadlessWordFormFiller()
+    for path in paths:
+        try:
+            questions = filler._parse_questions_from_text(extract_source_text(filler, path))
+        except Exception as e:
+            print(f"解析 {path} 時發生錯誤: {str(e)}", file=sys.stderr)
+            continue
+        source = os.path.basename(path)
+        for number, answer, explanation in questions:
+            yield {'source': source, 'number': number, 'answer': answer, 'explanation': explanation}
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record: Dict[str, str]):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        pass
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, record: Dict[str, str]):
+        self.writer.writerow(record)
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """欄式二進位輸出，累積一個列群組後立即寫出"""
+
+    def __init__(self, stream, group_size: int = COLUMNAR_GROUP_SIZE):
+        self.stream = stream
+        self.group_size = group_size
+        self.columns: Dict[str, List[bytes]] = {name: [] for name in FIELDS}
+        self.rows = 0
+        stream.write(COLUMNAR_MAGIC)
+        stream.write(struct.pack('<H', len(FIELDS)))
+        for name in FIELDS:
+            encoded = name.encode('utf-8')
+            stream.write(struct.pack('<H', len(encoded)) + encoded)
+
+    def write(self, record: Dict[str, str]):
+        for name in FIELDS:
+            self.columns[name].append(record[name].encode('utf-8'))
+        self.rows += 1
+        if self.rows >= self.group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        self.stream.write(b'RG' + struct.pack('<I', self.rows))
+        for name in FIELDS:
+            values = self.columns[name]
+            block = zlib.compress(struct.pack(f'<{len(values)}I', *map(len, values)) + b''.join(values))
+            self.stream.write(struct.pack('<I', len(block)) + block)
+            values.clear()
+        self.rows = 0
+
+    def close(self):
+        self._flush()
+        self.stream.write(b'EN')
+
+
+def read_columnar(path: str) -> Iterator[Dict[str, str]]:
+    """逐列讀取欄式檔案"""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"不是欄式答案檔: {path}")
+        names = []
+        for _ in range(struct.unpack('<H', f.read(2))[0]):
+            length = struct.unpack('<H', f.read(2))[0]
+            names.append(f.read(length).decode('utf-8'))
+        while f.read(2) == b'RG':
+            rows = struct.unpack('<I', f.read(4))[0]
+            columns = []
+            for _ in names:
+                block = zlib.decompress(f.read(struct.unpack('<I', f.read(4))[0]))
+                lengths = struct.unpack_from(f'<{rows}I', block)
+                offset = rows * 4
+                values = []
+                for length in lengths:
+                    values.append(block[offset:offset + length].decode('utf-8'))
+                    offset += length
+                columns.append(values)
+            for row in zip(*columns):
+                yield dict(zip(names, row))
+
+
+WRITERS = {
+    'jsonl': (JsonlWriter, False),
+    'csv': (CsvWriter, False),
+    'columnar': (ColumnarWriter, True),
+}
+
+
+def export(paths: List[str], output: str, fmt: str) -> Tuple[int, int]:
+    """匯出多份解析卷，回傳 (解析卷數, 題目數)"""
+    writer_class, binary = WRITERS[fmt]
+    if output == '-':
+        if binary:
+            raise ValueError("欄式格式無法輸出到標準輸出")
+        stream, close_stream = sys.stdout, False
+    elif binary:
+        stream, close_stream = open(output, 'wb'), True
+    else:
+        # 加上 BOM 讓 Excel 正確辨識 UTF-8
+        encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+        stream, close_stream = open(output, 'w', encoding=encoding, newline=''), True
+
+    count = 0
+    sources = set()
+    try:
+        writer = writer_class(stream)
+        for record in iter_records(paths):
+            writer.write(record)
+            sources.add(record['source'])
+            count += 1
+        writer.close()
+    finally:
+        if close_stream:
+            stream.close()
+    return len(sources), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將解析卷答案匯出為 JSONL / CSV / 欄式檔案")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='jsonl', help="輸出格式")
+    parser.add_argument('-o', '--output', required=True, help="輸出檔案，- 表示標準輸出")
+    parser.add_argument('sources', nargs='+', help="解析卷檔案 (.doc / .docx)")
+    args = parser.parse_args()
+
+    sources, count = export(args.sources, args.output, args.format)
+    print(f"已匯出 {sources} 份解析卷，共 {count} 題", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+解析段落 XML 複製工具
+
+將解析卷中的段落 XML 原封不動搬進解答卷儲存格，保留方程式 (OMML)、
+圖片與上下標等格式。圖片等媒體部件會重新建立關聯，
+相同內容的媒體在同一份輸出中只複製一次。
+"""
+
+import copy
+import hashlib
+import posixpath
+import re
+from typing import Dict, List, Optional
+
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml.ns import qn
+
+# 解析標籤，與解析器使用的規則一致
+EXPLANATION_LABEL = re.compile(r'^\s*解析\s*[：:]\s*')
+
+# 帶有關聯 ID 的屬性 (圖片 r:embed / r:link、VML 與 OLE 的 r:id 等)
+_REL_ATTRS = tuple(qn(name) for name in ('r:embed', 'r:link', 'r:id'))
+
+# 指向來源文件其他部件 (樣式、編號、註解、註腳) 的元素，目標文件中不存在對應定義；
+# 分節段落的 w:sectPr 若複製進儲存格會在表格中插入分節符號
+_DANGLING_TAGS = tuple(qn(name) for name in (
+    'w:pStyle', 'w:rStyle', 'w:numPr', 'w:bookmarkStart', 'w:bookmarkEnd',
+    'w:commentRangeStart', 'w:commentRangeEnd', 'w:commentReference',
+    'w:footnoteReference', 'w:endnoteReference', 'w:sectPr',
+))
+
+_DOC_PR = qn('wp:docPr')
+
+
+class UnsupportedFragmentError(Exception):
+    """段落引用了無法單純複製的部件 (例如帶有自身關聯的圖表)"""
+
+
+def strip_label(p_element, pattern=EXPLANATION_LABEL):
+    """從段落開頭移除標籤文字，標籤可能跨越多個 w:t"""
+    t_elements = list(p_element.iter(qn('w:t')))
+    text = "".join(t.text or "" for t in t_elements)
+    match = pattern.match(text)
+    if not match:
+        return
+    remaining = match.end()
+    for t in t_elements:
+        if remaining <= 0:
+            break
+        length = len(t.text or "")
+        t.text = (t.text or "")[remaining:]
+        remaining -= length
+
+
+class FragmentCopier:
+    """將來源段落複製到同一份目標文件，並快取已複製的媒體部件"""
+
+    def __init__(self, target_part):
+        self.target_part = target_part
+        self.package = target_part.package
+        # 媒體內容雜湊 -> 目標部件
+        self._media_parts: Dict[str, Part] = {}
+        # (來源部件名稱, 來源 rId) -> 目標 rId
+        self._rel_map: Dict[tuple, str] = {}
+        # 下一個可用的繪圖物件 ID，第一次複製繪圖時才掃描目標文件
+        self._next_drawing_id: Optional[int] = None
+
+    def copy_into_cell(self, cell, source_part, paragraphs: List, strip_first_label: bool = True):
+        """以來源段落取代儲存格內容"""
+        copies = [self._copy_paragraph(source_part, p) for p in paragraphs]
+        if strip_first_label and copies:
+            strip_label(copies[0])
+
+        tc = cell._tc
+        for p in tc.findall(qn('w:p')):
+            tc.remove(p)
+        for p in copies:
+            tc.append(p)
+
+    def _copy_paragraph(self, source_part, p_element):
+        new_p = copy.deepcopy(p_element)
+        for tag in _DANGLING_TAGS:
+            for element in list(new_p.iter(tag)):
+                element.getparent().remove(element)
+        for element in new_p.iter():
+            for attr in _REL_ATTRS:
+                rId = element.get(attr)
+                if rId:
+                    element.set(attr, self._map_rel(source_part, rId))
+        # 繪圖物件 ID 在整份文件中必須唯一，沿用來源的 ID 會與模板中的圖片重複
+        for doc_pr in new_p.iter(_DOC_PR):
+            doc_pr.set('id', str(self._new_drawing_id()))
+        return new_p
+
+    def _new_drawing_id(self) -> int:
+        if self._next_drawing_id is None:
+            self._next_drawing_id = self.target_part.next_id
+        drawing_id = self._next_drawing_id
+        self._next_drawing_id += 1
+        return drawing_id
+
+    def _map_rel(self, source_part, rId: str) -> str:
+        key = (str(source_part.partname), rId)
+        if key in self._rel_map:
+            return self._rel_map[key]
+
+        rel = source_part.rels.get(rId)
+        if rel is None:
+            raise UnsupportedFragmentError(f"找不到關聯 {rId}")
+        if rel.is_external:
+            new_rId = self.target_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        else:
+            new_rId = self.target_part.relate_to(self._get_or_add_part(rel.target_part), rel.reltype)
+        self._rel_map[key] = new_rId
+        return new_rId
+
+    def _get_or_add_part(self, source_media) -> Part:
+        """複製沒有自身關聯的部件 (圖片、內嵌物件)，相同內容只複製一次"""
+        if len(source_media.rels):
+            raise UnsupportedFragmentError(f"不支援複製含有關聯的部件: {source_media.partname}")
+        blob = source_media.blob
+        digest = hashlib.sha1(blob).hexdigest()
+        part = self._media_parts.get(digest)
+        if part is None:
+            directory, filename = posixpath.split(str(source_media.partname))
+            stem, ext = posixpath.splitext(filename)
+            stem = re.sub(r'\d+$', '', stem) or 'media'
+            partname = self.package.next_partname(f"{directory}/{stem}%d{ext}")
+            part = Part(PackURI(partname), source_media.content_type, blob, self.package)
+            self._media_parts[digest] = part
+        return part
+
+
+def paragraphs_for_lines(line_indices: List[int], line_paragraphs: List[int],
+                         paragraph_lines: List[List[int]]) -> Optional[List[int]]:
+    """將解析所佔的文字行對應回段落索引
+
+    line_paragraphs 為每一行所屬的段落，paragraph_lines 為每個段落的非空白行。
+    沒有文字的段落 (只有圖片或方程式) 若夾在解析中或緊接在解析之後，也一併納入。
+    若有段落同時含有解析以外的文字 (例如答案與解析共用一個段落) 則回傳 None，
+    呼叫端應退回純文字。
+    """
+    if not line_indices:
+        return None
+    selected = set(line_indices)
+    first = line_paragraphs[min(selected)]
+    last = line_paragraphs[max(selected)]
+    while last + 1 < len(paragraph_lines) and not paragraph_lines[last + 1]:
+        last += 1
+    paragraphs = list(range(first, last + 1))
+    for paragraph_index in paragraphs:
+        if not selected.issuperset(paragraph_lines[paragraph_index]):
+            return None
+    return paragraphs
@@ -0,0 +1,74 @@
+"""
+輕量 .docx 文字讀取
+
+直接以 zipfile 與 iterparse 逐段讀取 document.xml，不建立 python-docx 物件模型，
+記憶體用量不隨文件大小成長。段落文字的組成方式與 python-docx 的 Paragraph.text 相同，
+因此解析結果與原本流程一致。
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+
+def _main_document_name(archive: zipfile.ZipFile) -> str:
+    """由套件關聯找出主文件部件，找不到時使用預設位置"""
+    try:
+        root = ET.fromstring(archive.read('_rels/.rels'))
+    except KeyError:
+        return 'word/document.xml'
+    for rel in root.iter(f'{_REL}Relationship'):
+        if rel.get('Type') == _OFFICE_DOCUMENT:
+            return posixpath.normpath(rel.get('Target').lstrip('/'))
+    return 'word/document.xml'
+
+
+def _paragraph_text(p) -> str:
+    # 與 python-docx 相同：只取段落直屬的 w:r，w:tab 轉為 \t，w:br / w:cr 轉為 \n
+    parts = []
+    for r in p:
+        if r.tag != f'{_W}r':
+            continue
+        for child in r:
+            if child.tag == f'{_W}t':
+                parts.append(child.text or '')
+            elif child.tag == f'{_W}tab':
+                parts.append('\t')
+            elif child.tag in (f'{_W}br', f'{_W}cr'):
+                parts.append('\n')
+    return ''.join(parts)
+
+
+def iter_paragraph_texts(path: str) -> Iterator[str]:
+    """依序產生文件本文 (不含表格) 每個段落的文字"""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(_main_document_name(archive)) as f:
+            depth = 0
+            body = None
+            for event, element in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2 and element.tag == f'{_W}body':
+                        body = element
+                    continue
+                depth -= 1
+                if depth == 2 and body is not None:
+                    if element.tag == f'{_W}p':
+                        yield _paragraph_text(element)
+                    # 處理完的本文元素立即移除，保持記憶體用量固定
+                    body.remove(element)
+
+
+def read_docx_text(path: str) -> str:
+    """組成與 parse_source_document 相同格式的全文：每個非空白段落一行"""
+    lines = []
+    for text in iter_paragraph_texts(path):
+        text = text.strip()
+        if text:
+            lines.append(text + "\n")
+    return "".join(lines)
@@ -0,0 +1,129 @@
+"""
+精簡 .docx 寫入器
+
+不需要模板也不經過 python-docx，直接輸出最少的 OOXML 部件，
+並以串流方式逐列寫入 題序/答案/解析 表格，適合沒有特殊解答卷模板的情況。
+"""
+
+import re
+import zipfile
+from typing import Iterable, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+# A4 直式頁面與 2 公分邊界 (twips)
+PAGE_WIDTH = 11906
+PAGE_HEIGHT = 16838
+PAGE_MARGIN = 1134
+# 各欄所佔比例 (題序/答案/解析)
+COLUMN_RATIOS = (0.12, 0.18, 0.70)
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+# XML 1.0 不允許的控制字元
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+
+_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# 字體只在文件預設值設定一次，每個 run 不需要重複的 rPr
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:styles xmlns:w="{_W_NS}">'
+    '<w:docDefaults><w:rPrDefault><w:rPr>'
+    '<w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:eastAsia="{font}" w:cs="{font}"/>'
+    '<w:sz w:val="24"/><w:szCs w:val="24"/>'
+    '</w:rPr></w:rPrDefault></w:docDefaults>'
+    '</w:styles>'
+)
+
+
+def _text(value: str) -> str:
+    return escape(_INVALID_XML_CHARS.sub('', value))
+
+
+def _paragraph(text: str) -> str:
+    if not text:
+        return '<w:p/>'
+    return f'<w:p><w:r><w:t xml:space="preserve">{_text(text)}</w:t></w:r></w:p>'
+
+
+def _row(values: Sequence[str], widths: Sequence[int], header: bool = False) -> str:
+    # 標題列在每頁重複；一般列不跨頁分割
+    tr_pr = '<w:trPr><w:tblHeader/></w:trPr>' if header else '<w:trPr><w:cantSplit/></w:trPr>'
+    cells = ''.join(
+        f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr>{_paragraph(value)}</w:tc>'
+        for value, width in zip(values, widths))
+    return f'<w:tr>{tr_pr}{cells}</w:tr>'
+
+
+def write_answer_sheet(path: str, rows: Iterable[Tuple[str, str, str]],
+                       headers: Sequence[str] = ('題序', '答案', '解析'),
+                       font: str = '標楷體', title: str = '') -> int:
+    """將 (題序, 答案, 解析) 逐列寫成 .docx，回傳寫入的列數"""
+    usable = PAGE_WIDTH - 2 * PAGE_MARGIN
+    if len(headers) == len(COLUMN_RATIOS):
+        widths = [int(usable * ratio) for ratio in COLUMN_RATIOS]
+    else:
+        widths = [usable // len(headers)] * len(headers)
+    border = '<w:{0} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    borders = ''.join(border.format(side) for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+
+    count = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _PACKAGE_RELS)
+        archive.writestr('word/_rels/document.xml.rels', _DOCUMENT_RELS)
+        archive.writestr('word/styles.xml', _STYLES.replace('{font}', escape(font, {'"': '&quot;'})))
+
+        with archive.open('word/document.xml', 'w') as f:
+            f.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<w:document xmlns:w="{_W_NS}"><w:body>'
+                + (_paragraph(title) if title else '')
+                + '<w:tbl><w:tblPr>'
+                f'<w:tblW w:w="{sum(widths)}" w:type="dxa"/>'
+                f'<w:tblBorders>{borders}</w:tblBorders>'
+                '<w:tblLayout w:type="fixed"/>'
+                '</w:tblPr><w:tblGrid>'
+                + ''.join(f'<w:gridCol w:w="{width}"/>' for width in widths)
+                + '</w:tblGrid>'
+                + _row(headers, widths, header=True)
+            ).encode('utf-8'))
+            for values in rows:
+                f.write(_row(values, widths).encode('utf-8'))
+                count += 1
+            f.write((
+                '</w:tbl><w:p/>'
+                f'<w:sectPr><w:pgSz w:w="{PAGE_WIDTH}" w:h="{PAGE_HEIGHT}"/>'
+                f'<w:pgMar w:top="{PAGE_MARGIN}" w:right="{PAGE_MARGIN}" w:bottom="{PAGE_MARGIN}" '
+                f'w:left="{PAGE_MARGIN}" w:header="851" w:footer="992" w:gutter="0"/></w:sectPr>'
+                '</w:body></w:document>'
+            ).encode('utf-8'))
+    return count
@@ -0,0 +1,399 @@
+"""
+Word 表格填寫 HTTP 服務
+
+以標準函式庫提供本機 HTTP 介面，讓其他工具上傳解析卷與解答卷，
+直接取回填寫完成的 .docx，不需啟動 Tk 視窗。
+
+    python fill_service.py --port 8765 --workers 4 --queue-size 8
+
+POST /fill   multipart 欄位: source (必填), template (選填，未提供且無預設模板時以內建格式產生),
+             timeout (秒, 選填),
+             preserve_xml (1 表示保留解析中的方程式與圖片, 選填),
+             fast_layout (1 表示輸出固定欄寬的快速開啟版面, 選填),
+             packed_layout (1 表示每列多題的緊湊版面, 選填),
+             packed_appendix (0 表示緊湊版面不輸出解析附錄, 選填，預設輸出)
+GET  /stats  延遲與吞吐量統計 (JSON)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+# 每次回傳給用戶端的區塊大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 工作程序內的常駐物件，由 _init_worker 預先載入
+_worker_filler = None
+_worker_default_template = None
+
+
+def _init_worker(default_template: Optional[bytes]):
+    """預先載入 python-docx、解析器與轉換工具，讓每個工作程序保持熱機"""
+    global _worker_filler, _worker_default_template
+    import docx  # noqa: F401  預先匯入，避免第一個請求付出載入成本
+    from word_form_filler_doc import HeadlessWordFormFiller
+
+    _worker_filler = HeadlessWordFormFiller()
+    for name in ('antiword', 'catdoc', 'libreoffice', 'pandoc'):
+        try:
+            _worker_filler._require_converter(name)
+        except FileNotFoundError:
+            pass
+    _worker_default_template = default_template
+
+
+def _run_fill_job(source_name: str, source_data: bytes, template_data: Optional[bytes],
+                  preserve_xml: bool = False, fast_layout: bool = False,
+                  packed_layout: bool = False, packed_appendix: bool = True) -> Tuple[Optional[str], str]:
+    """在工作程序中執行一次填寫，回傳 (輸出檔路徑, 錯誤訊息)"""
+    if template_data is None:
+        template_data = _worker_default_template
+
+    work_dir = tempfile.mkdtemp(prefix="wff_job_")
+    messages = []
+    _worker_filler.log_callback = messages.append
+    _worker_filler.preserve_xml = preserve_xml
+    _worker_filler.fast_layout = fast_layout
+    _worker_filler.packed_layout = packed_layout
+    _worker_filler.packed_appendix = packed_appendix
+    # 只有成功時保留工作目錄交給請求端串流，其餘情況一律清理
+    succeeded = False
+    try:
+        source_ext = os.path.splitext(source_name)[1].lower() or '.docx'
+        source_path = os.path.join(work_dir, f"source{source_ext}")
+        template_path = os.path.join(work_dir, "template.docx")
+        output_path = os.path.join(work_dir, "output.docx")
+        with open(source_path, 'wb') as f:
+            f.write(source_data)
+        if template_data is not None:
+            with open(template_path, 'wb') as f:
+                f.write(template_data)
+
+        questions = _worker_filler.parse_source_document(source_path)
+        if not questions:
+            return None, "未能從解析卷中提取到任何題目"
+        if template_data is None:
+            saved = _worker_filler.generate_answer_sheet(questions, output_path)
+        else:
+            saved = _worker_filler.fill_target_document(template_path, questions, output_path)
+        if not saved:
+            return None, messages[-1] if messages else "填寫目標文檔失敗"
+        succeeded = True
+        return output_path, ""
+    finally:
+        _worker_filler.log_callback = None
+        if not succeeded:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class ServiceStats:
+    """記錄請求數量、延遲與吞吐量"""
+
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.window = window
+        self.latencies: List[float] = []
+        self.counts = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeout': 0}
+        self.in_flight = 0
+
+    def record(self, status: str, latency: Optional[float] = None):
+        with self.lock:
+            self.counts[status] += 1
+            if latency is not None:
+                self.latencies.append(latency)
+                if len(self.latencies) > self.window:
+                    del self.latencies[:len(self.latencies) - self.window]
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            counts = dict(self.counts)
+            in_flight = self.in_flight
+        uptime = time.time() - self.started_at
+
+        def percentile(p):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 1)
+
+        return {
+            'uptime_seconds': round(uptime, 1),
+            'in_flight': in_flight,
+            'counts': counts,
+            'throughput_per_minute': round(counts['completed'] / uptime * 60, 2) if uptime else 0,
+            'latency_ms': {
+                'p50': percentile(50),
+                'p90': percentile(90),
+                'p99': percentile(99),
+                'max': percentile(100),
+            },
+        }
+
+
+class FillService:
+    """管理工作程序池與佇列容量"""
+
+    def __init__(self, workers: int, queue_size: int, timeout: float,
+                 default_template: Optional[bytes] = None):
+        self.timeout = timeout
+        self.has_default_template = default_template is not None
+        self.stats = ServiceStats()
+        # 執行中與等待中的工作總數上限，滿了就回傳 429
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        # 保護工作的 abandoned/cleaned 標記，避免逾時與完成同時發生時漏掉清理
+        self.cleanup_lock = threading.Lock()
+        self.workers = workers
+        self.default_template = default_template
+        self.executor_lock = threading.Lock()
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_init_worker,
+                                   initargs=(self.default_template,))
+
+    def replace_broken_executor(self, broken: ProcessPoolExecutor):
+        """工作程序異常結束後程序池無法再使用，換成新的程序池 (已被其他請求換過則略過)"""
+        with self.executor_lock:
+            if self.executor is not broken:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+
+    def submit(self, source_name: str, source_data: bytes, template_data: Optional[bytes],
+               preserve_xml: bool = False, fast_layout: bool = False, packed_layout: bool = False,
+               packed_appendix: bool = True):
+        """送出工作，佇列已滿時回傳 None"""
+        if not self.slots.acquire(blocking=False):
+            return None
+        with self.stats.lock:
+            self.stats.in_flight += 1
+        # 程序池已損壞時換新並重送一次；仍失敗則歸還名額後拋出
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                future = executor.submit(_run_fill_job, source_name, source_data, template_data,
+                                         preserve_xml, fast_layout, packed_layout, packed_appendix)
+                break
+            except BrokenProcessPool:
+                self.replace_broken_executor(executor)
+                if attempt:
+                    with self.stats.lock:
+                        self.stats.in_flight -= 1
+                    self.slots.release()
+                    raise
+        future.executor = executor
+        # 逾時的工作仍在工作程序中執行，等它真正結束才釋放名額
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, future):
+        with self.stats.lock:
+            self.stats.in_flight -= 1
+        self.slots.release()
+        # 逾時後才完成的工作沒有人會取走輸出，直接清理
+        with self.cleanup_lock:
+            if getattr(future, 'abandoned', False):
+                self._discard_output(future)
+
+    def abandon(self, future):
+        """請求端逾時放棄工作；若工作已在此之前完成，由這裡清理輸出"""
+        with self.cleanup_lock:
+            future.abandoned = True
+            if future.done():
+                self._discard_output(future)
+
+    def _discard_output(self, future):
+        # 呼叫端需持有 cleanup_lock
+        if getattr(future, 'cleaned', False) or future.cancelled() or future.exception():
+            return
+        future.cleaned = True
+        output_path, _ = future.result()
+        if output_path:
+            shutil.rmtree(os.path.dirname(output_path), ignore_errors=True)
+
+    def shutdown(self):
+        with self.executor_lock:
+            self.executor.shutdown(wait=True)
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[str, bytes]]:
+    """解析 multipart/form-data，回傳 {欄位名稱: (檔名, 內容)}"""
+    header = f"Content-Type: {content_type}\r\nMIME-Version: 1.0\r\n\r\n".encode('utf-8')
+    message = BytesParser(policy=policy.HTTP).parsebytes(header + body)
+    fields = {}
+    if not message.is_multipart():
+        return fields
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = (part.get_filename() or '', part.get_payload(decode=True) or b'')
+    return fields
+
+
+def _form_flag(fields: Dict[str, Tuple[str, bytes]], name: str, default: bool = False) -> bool:
+    if name not in fields:
+        return default
+    return fields[name][1].strip().lower() in (b'1', b'true', b'yes')
+
+
+class FillRequestHandler(BaseHTTPRequestHandler):
+    service: FillService = None
+
+    def log_message(self, format, *args):
+        # 保持主控台安靜，統計改由 /stats 提供
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.service.stats.snapshot())
+        else:
+            self._send_json(404, {'error': '找不到路徑'})
+
+    def do_POST(self):
+        if self.path != '/fill':
+            self._send_json(404, {'error': '找不到路徑'})
+            return
+
+        content_type = self.headers.get('Content-Type', '')
+        length = int(self.headers.get('Content-Length') or 0)
+        if not content_type.startswith('multipart/form-data') or length <= 0:
+            self._send_json(400, {'error': '請以 multipart/form-data 上傳檔案'})
+            return
+        fields = _parse_multipart(content_type, self.rfile.read(length))
+
+        if 'source' not in fields:
+            self._send_json(400, {'error': '缺少 source 解析卷檔案'})
+            return
+
+        timeout = self.service.timeout
+        if 'timeout' in fields:
+            try:
+                timeout = min(timeout, float(fields['timeout'][1].decode('utf-8')))
+            except ValueError:
+                self._send_json(400, {'error': 'timeout 必須是數字'})
+                return
+
+        source_name, source_data = fields['source']
+        template_data = fields['template'][1] if 'template' in fields else None
+        preserve_xml = _form_flag(fields, 'preserve_xml')
+        fast_layout = _form_flag(fields, 'fast_layout')
+        packed_layout = _form_flag(fields, 'packed_layout')
+        packed_appendix = _form_flag(fields, 'packed_appendix', default=True)
+        # 沒有模板時以內建格式產生，緊湊版面與保留原始格式都無法套用
+        if template_data is None and not self.service.has_default_template:
+            unsupported = [name for name, enabled in (('packed_layout', packed_layout),
+                                                      ('preserve_xml', preserve_xml)) if enabled]
+            if unsupported:
+                self._send_json(400, {'error': f"{', '.join(unsupported)} 需要提供 template 解答卷"})
+                return
+
+        start = time.perf_counter()
+        try:
+            future = self.service.submit(source_name or 'source.docx', source_data, template_data,
+                                         preserve_xml, fast_layout, packed_layout, packed_appendix)
+        except BrokenProcessPool:
+            self.service.stats.record('failed', time.perf_counter() - start)
+            self._send_json(503, {'error': '工作程序異常結束，請重試'}, {'Retry-After': '1'})
+            return
+        if future is None:
+            self.service.stats.record('rejected')
+            self._send_json(429, {'error': '佇列已滿，請稍後再試'}, {'Retry-After': '1'})
+            return
+
+        try:
+            output_path, error = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.service.abandon(future)
+            self.service.stats.record('timeout')
+            self._send_json(504, {'error': f'處理逾時 ({timeout:g} 秒)'})
+            return
+        except BrokenProcessPool:
+            self.service.replace_broken_executor(future.executor)
+            self.service.stats.record('failed', time.perf_counter() - start)
+            self._send_json(503, {'error': '工作程序異常結束，請重試'}, {'Retry-After': '1'})
+            return
+        except Exception as e:
+            self.service.stats.record('failed', time.perf_counter() - start)
+            self._send_json(500, {'error': f'處理失敗: {str(e)}'})
+            return
+
+        if not output_path:
+            self.service.stats.record('failed', time.perf_counter() - start)
+            self._send_json(422, {'error': error})
+            return
+
+        try:
+            self._stream_file(output_path, source_name)
+        finally:
+            shutil.rmtree(os.path.dirname(output_path), ignore_errors=True)
+        self.service.stats.record('completed', time.perf_counter() - start)
+
+    def _stream_file(self, path: str, source_name: str):
+        """分塊傳回輸出檔，不將整份文件載入記憶體"""
+        base_name = os.path.splitext(os.path.basename(source_name))[0] or 'output'
+        download_name = f"{base_name}_已填寫.docx"
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.send_header('Content-Disposition',
+                         f"attachment; filename*=UTF-8''{quote(download_name)}")
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, STREAM_CHUNK_SIZE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Word 表格填寫 HTTP 服務")
+    parser.add_argument('--host', default='127.0.0.1', help="監聽位址 (預設 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="監聽埠號 (預設 8765)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="工作程序數量")
+    parser.add_argument('--queue-size', type=int, default=8, help="可等待的工作數量上限")
+    parser.add_argument('--timeout', type=float, default=120, help="每個請求的逾時秒數")
+    parser.add_argument('--template', help="預設解答卷模板 (.docx)")
+    args = parser.parse_args()
+
+    default_template = None
+    if args.template:
+        with open(args.template, 'rb') as f:
+            default_template = f.read()
+
+    service = FillService(args.workers, args.queue_size, args.timeout, default_template)
+    FillRequestHandler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), FillRequestHandler)
+    print(f"服務已啟動: http://{args.host}:{args.port} (工作程序 {args.workers} 個)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
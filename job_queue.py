@@ -0,0 +1,367 @@
+"""
+Word 表格填寫批次佇列
+
+以 SQLite 記錄每一組 解析卷/解答卷 的處理狀態 (pending/running/done/failed)、
+嘗試次數與錯誤訊息。程式中斷後重新執行 run 會略過已完成的工作，
+失敗的工作依指數退避重試，多個工作程序可同時從同一個佇列取工作。
+
+    python job_queue.py add --db jobs.db --template 解答卷.docx 解析卷1.doc 解析卷2.doc
+    python job_queue.py run --db jobs.db --workers 4
+    python job_queue.py status --db jobs.db
+    python job_queue.py retry-failed --db jobs.db
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    output TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    next_run_at REAL NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    started_at REAL,
+    finished_at REAL,
+    UNIQUE (source, target, output)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, next_run_at);
+"""
+
+JOB_STATES = ('pending', 'running', 'done', 'failed')
+
+# 預設重試與租約設定
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF = 5.0
+DEFAULT_LEASE = 600.0
+
+# 工作程序在處理中結束 (當掉或租約逾時) 且已用完嘗試次數時記錄的錯誤
+INTERRUPTED_ERROR = "工作程序多次在處理中中斷 (當掉或逾時)"
+
+
+class PermanentJobError(Exception):
+    """重試也不會成功的錯誤，例如來源檔案不存在"""
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """開啟佇列資料庫，啟用 WAL 讓多個程序可同時讀寫"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def default_output_path(source: str, target: str, output_dir: Optional[str] = None) -> str:
+    """以解析卷檔名命名輸出檔，避免同一份模板的多個工作互相覆蓋"""
+    base_name = os.path.splitext(os.path.basename(source))[0]
+    directory = output_dir or os.path.dirname(os.path.abspath(target))
+    return os.path.join(directory, f"{base_name}_已填寫.docx")
+
+
+def add_jobs(conn: sqlite3.Connection, pairs: List[Tuple[str, str, str]]) -> int:
+    """加入 (解析卷, 解答卷, 輸出檔) 工作，已存在的組合不會重複加入"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (source, target, output) VALUES (?, ?, ?)",
+            [(os.path.abspath(s), os.path.abspath(t), os.path.abspath(o)) for s, t, o in pairs])
+        added = conn.total_changes - before
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        return _windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _windows_pid_alive(pid: int) -> bool:
+    # Windows 的 os.kill 會直接結束程序，改以 OpenProcess 查詢結束代碼
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # 無權限開啟代表程序存在；其他錯誤 (找不到程序) 視為已結束
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _fail_interrupted(conn: sqlite3.Connection, job_id: int, now: float):
+    # 呼叫端需在交易中
+    conn.execute("UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, worker = NULL, "
+                 "finished_at = ? WHERE id = ?", (INTERRUPTED_ERROR, now, job_id))
+
+
+def recover_stale_jobs(conn: sqlite3.Connection, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """將本機上已結束程序遺留的 running 工作放回 pending；已用完嘗試次數的改為 failed"""
+    host = socket.gethostname()
+    recovered = 0
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("SELECT id, worker, attempts FROM jobs WHERE state = 'running'").fetchall()
+        for job_id, worker, attempts in rows:
+            worker_host, _, pid = (worker or '').rpartition(':')
+            if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                if attempts >= max_attempts:
+                    _fail_interrupted(conn, job_id, now)
+                    continue
+                conn.execute("UPDATE jobs SET state = 'pending', lease_until = NULL, worker = NULL "
+                             "WHERE id = ?", (job_id,))
+                recovered += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return recovered
+
+
+def claim_job(conn: sqlite3.Connection, lease: float = DEFAULT_LEASE,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Optional[Tuple[int, str, str, str, int]]:
+    """取出一個可執行的工作；租約過期的 running 工作視為中斷，可被重新領取
+
+    中斷的工作已用完嘗試次數時改為 failed，避免會讓工作程序當掉或卡住的來源無限重試。
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        while True:
+            row = conn.execute(
+                "SELECT id, source, target, output, attempts, state FROM jobs "
+                "WHERE (state = 'pending' AND next_run_at <= ?) "
+                "   OR (state = 'running' AND lease_until < ?) "
+                "ORDER BY id LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row[5] == 'running' and row[4] >= max_attempts:
+                _fail_interrupted(conn, row[0], now)
+                continue
+            break
+        conn.execute(
+            "UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_until = ?, "
+            "worker = ?, started_at = ?, error = NULL WHERE id = ?",
+            (now + lease, _worker_id(), now, row[0]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    job_id, source, target, output, attempts, _ = row
+    return job_id, source, target, output, attempts + 1
+
+
+def complete_job(conn: sqlite3.Connection, job_id: int):
+    conn.execute("UPDATE jobs SET state = 'done', lease_until = NULL, finished_at = ? WHERE id = ?",
+                 (time.time(), job_id))
+
+
+def fail_job(conn: sqlite3.Connection, job_id: int, attempts: int, error: str,
+             permanent: bool = False, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+             backoff: float = DEFAULT_BACKOFF):
+    """記錄失敗；尚有重試次數時以指數退避排回 pending"""
+    now = time.time()
+    if permanent or attempts >= max_attempts:
+        conn.execute("UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, finished_at = ? "
+                     "WHERE id = ?", (error, now, job_id))
+    else:
+        delay = backoff * (2 ** (attempts - 1))
+        conn.execute("UPDATE jobs SET state = 'pending', error = ?, lease_until = NULL, next_run_at = ? "
+                     "WHERE id = ?", (error, now + delay, job_id))
+
+
+def retry_failed(conn: sqlite3.Connection) -> int:
+    """將 failed 的工作重設為 pending，嘗試次數歸零"""
+    cursor = conn.execute("UPDATE jobs SET state = 'pending', attempts = 0, next_run_at = 0, "
+                          "finished_at = NULL WHERE state = 'failed'")
+    return cursor.rowcount
+
+
+def count_states(conn: sqlite3.Connection) -> dict:
+    counts = {state: 0 for state in JOB_STATES}
+    for state, count in conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+        counts[state] = count
+    return counts
+
+
+def run_job(filler, source: str, target: str, output: str):
+    """執行單一工作；先寫入暫存檔再改名，避免中斷時留下不完整的輸出"""
+    if not os.path.exists(source):
+        raise PermanentJobError(f"解析卷檔案不存在: {source}")
+    if not os.path.exists(target):
+        raise PermanentJobError(f"解答卷檔案不存在: {target}")
+
+    messages = []
+    filler.log_callback = messages.append
+    try:
+        questions = filler.parse_source_document(source)
+        if not questions:
+            raise RuntimeError(messages[-1] if messages else "未能從解析卷中提取到任何題目")
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        partial_path = f"{output}.{os.getpid()}.partial"
+        try:
+            if not filler.fill_target_document(target, questions, partial_path):
+                raise RuntimeError(messages[-1] if messages else "填寫目標文檔失敗")
+            os.replace(partial_path, output)
+        except BaseException:
+            # 存檔中途失敗會留下不完整的暫存檔
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+            raise
+    finally:
+        filler.log_callback = None
+
+
+def worker_loop(db_path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                backoff: float = DEFAULT_BACKOFF, lease: float = DEFAULT_LEASE,
+                poll_interval: float = 1.0, question_bank: Optional[str] = None):
+    """持續領取工作直到佇列中沒有待處理或等待重試的工作"""
+    from word_form_filler_doc import HeadlessWordFormFiller
+
+    filler = HeadlessWordFormFiller()
+    filler.question_bank_path = question_bank
+    conn = connect(db_path)
+    try:
+        while True:
+            job = claim_job(conn, lease, max_attempts)
+            if job is None:
+                pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'pending'").fetchone()[0]
+                if pending == 0:
+                    return
+                # 還有工作在退避等待中
+                time.sleep(poll_interval)
+                continue
+
+            job_id, source, target, output, attempts = job
+            start = time.perf_counter()
+            try:
+                run_job(filler, source, target, output)
+            except PermanentJobError as e:
+                fail_job(conn, job_id, attempts, str(e), permanent=True)
+                print(f"[{os.getpid()}] 工作 {job_id} 失敗: {e}")
+            except Exception as e:
+                fail_job(conn, job_id, attempts, str(e), max_attempts=max_attempts, backoff=backoff)
+                print(f"[{os.getpid()}] 工作 {job_id} 第 {attempts} 次嘗試失敗: {e}")
+            else:
+                complete_job(conn, job_id)
+                print(f"[{os.getpid()}] 工作 {job_id} 完成 ({time.perf_counter() - start:.1f} 秒): "
+                      f"{os.path.basename(output)}")
+    finally:
+        conn.close()
+
+
+def run_workers(db_path: str, workers: int, **kwargs):
+    """啟動多個工作程序處理佇列"""
+    conn = connect(db_path)
+    try:
+        recovered = recover_stale_jobs(conn, kwargs.get('max_attempts', DEFAULT_MAX_ATTEMPTS))
+    finally:
+        conn.close()
+    if recovered:
+        print(f"已恢復 {recovered} 個中斷的工作")
+
+    if workers <= 1:
+        worker_loop(db_path, **kwargs)
+        return
+    processes = [multiprocessing.Process(target=worker_loop, args=(db_path,), kwargs=kwargs)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Word 表格填寫批次佇列")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help="加入工作")
+    add_parser.add_argument('--db', required=True, help="佇列資料庫路徑")
+    add_parser.add_argument('--template', required=True, help="解答卷模板 (.docx)")
+    add_parser.add_argument('--output-dir', help="輸出資料夾 (預設與模板相同)")
+    add_parser.add_argument('sources', nargs='+', help="解析卷檔案")
+
+    run_parser = subparsers.add_parser('run', help="處理佇列中的工作")
+    run_parser.add_argument('--db', required=True, help="佇列資料庫路徑")
+    run_parser.add_argument('--workers', type=int, default=1, help="工作程序數量")
+    run_parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help="每個工作的最多嘗試次數")
+    run_parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF, help="第一次重試前等待的秒數")
+    run_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE, help="工作租約秒數，逾期視為中斷")
+    run_parser.add_argument('--question-bank', help="同時將解析結果寫入題庫資料庫")
+
+    status_parser = subparsers.add_parser('status', help="顯示佇列狀態")
+    status_parser.add_argument('--db', required=True, help="佇列資料庫路徑")
+    status_parser.add_argument('--failed', action='store_true', help="列出失敗的工作")
+
+    retry_parser = subparsers.add_parser('retry-failed', help="重新排入失敗的工作")
+    retry_parser.add_argument('--db', required=True, help="佇列資料庫路徑")
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run_workers(args.db, args.workers, max_attempts=args.max_attempts,
+                    backoff=args.backoff, lease=args.lease, question_bank=args.question_bank)
+        return
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'add':
+            pairs = [(source, args.template, default_output_path(source, args.template, args.output_dir))
+                     for source in args.sources]
+            print(f"已加入 {add_jobs(conn, pairs)} 個工作")
+        elif args.command == 'status':
+            counts = count_states(conn)
+            print("  ".join(f"{state}: {counts[state]}" for state in JOB_STATES))
+            if args.failed:
+                for job_id, source, attempts, error in conn.execute(
+                        "SELECT id, source, attempts, error FROM jobs WHERE state = 'failed' ORDER BY id"):
+                    print(f"{job_id}\t{os.path.basename(source)}\t嘗試 {attempts} 次\t{error}")
+        elif args.command == 'retry-failed':
+            print(f"已重新排入 {retry_failed(conn)} 個工作")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
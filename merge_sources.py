@@ -0,0 +1,79 @@
+"""
+合併多份解析卷
+
+平行解析多份解析卷，依序在同一份解答卷中組成「標題 + 表格」，
+模板只載入一次、輸出只保存一次，適合單元總複習的答案本。
+
+    python merge_sources.py --template 解答卷.docx -o 總複習_已填寫.docx 第1章.doc 第2章.doc ...
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+_worker_filler = None
+
+
+def _init_worker():
+    global _worker_filler
+    from word_form_filler_doc import HeadlessWordFormFiller
+    _worker_filler = HeadlessWordFormFiller()
+
+
+def _parse_source(path: str) -> Tuple[str, List[Tuple[str, str, str]]]:
+    return path, _worker_filler.parse_source_document(path)
+
+
+def parse_sources(paths: List[str], jobs: int) -> List[Tuple[str, List[Tuple[str, str, str]]]]:
+    """平行解析各份解析卷，結果依輸入順序回傳"""
+    if jobs <= 1 or len(paths) <= 1:
+        _init_worker()
+        return [_parse_source(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        return list(executor.map(_parse_source, paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將多份解析卷合併填入同一份解答卷")
+    parser.add_argument('--template', required=True, help="解答卷模板 (.docx)，第一個表格作為每份解析卷的表格格式")
+    parser.add_argument('-o', '--output', required=True, help="輸出檔案 (.docx)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="平行解析的程序數量")
+    parser.add_argument('--fast-layout', action='store_true', help="輸出固定欄寬的快速開啟版面")
+    parser.add_argument('--packed-layout', action='store_true', help="每列多題的緊湊版面")
+    parser.add_argument('--no-appendix', action='store_true', help="緊湊版面不輸出解析附錄")
+    parser.add_argument('sources', nargs='+', help="解析卷檔案 (.doc / .docx)，依章節順序排列")
+    args = parser.parse_args()
+
+    from word_form_filler_doc import HeadlessWordFormFiller
+
+    start = time.perf_counter()
+    parsed = parse_sources(args.sources, args.jobs)
+    sections = []
+    for path, questions in parsed:
+        title = os.path.splitext(os.path.basename(path))[0]
+        if questions:
+            sections.append((title, questions))
+            print(f"{title}: {len(questions)} 題")
+        else:
+            print(f"{title}: 未能提取到任何題目，略過")
+    print(f"解析完成 ({time.perf_counter() - start:.1f} 秒)")
+
+    if not sections:
+        print("沒有可合併的題目")
+        return
+
+    messages = []
+    filler = HeadlessWordFormFiller(messages.append)
+    filler.fast_layout = args.fast_layout
+    filler.packed_layout = args.packed_layout
+    filler.packed_appendix = not args.no_appendix
+    if filler.fill_merged_document(args.template, sections, args.output):
+        print(f"已保存到: {args.output} ({time.perf_counter() - start:.1f} 秒)")
+    else:
+        print(messages[-1] if messages else "合併失敗")
+
+
+if __name__ == "__main__":
+    main()
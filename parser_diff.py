@@ -0,0 +1,253 @@
+"""
+解析器差異比對
+
+產生隨機與刁鑽的解析卷文字，將目前的 _parse_questions_from_text (參考解析器)
+與其他解析引擎並排執行，回報每個引擎第一筆與參考結果不同的紀錄以及各引擎的處理速度。
+任何解析器的效能改寫都應先通過這個比對，確保答案不變。
+
+    python parser_diff.py                              # 比對所有內建引擎
+    python parser_diff.py --engines docx --cases 2000 --seed 7
+    python parser_diff.py --engines my_parser:parse    # 比對新的解析函式
+
+內建引擎：
+    doc          word_form_filler_doc.py (參考解析器)
+    docx         word_form_filler.py
+    test_parser  test_parser.py
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+Question = Tuple[str, str, str]
+Engine = Callable[[str], List[Question]]
+
+REFERENCE_ENGINE = 'doc'
+
+# 刁鑽案例：各版本解析器曾經出現分歧的寫法
+ADVERSARIAL_CASES = [
+    "答案：(A)\n解析：基本單選",
+    "1. 答案：(Ｃ)\n解析：題號與答案同一行",
+    "答案 : (B)\n解析 : 半形冒號前後有空白",
+    "答案：（Ｄ）\n解析：全形括號與全形字母",
+    "答案：(1)(Ｂ)；(2)(Ａ)\n解析：多選全形",
+    "答案 : (1)(A); (2)(D)\n解析：多選半形",
+    "答案：(A)\n\n\n解析：中間有空行\n\n第二行",
+    "答案：(A)\n解析：\n解析標籤後換行才有內容",
+    "答案：(B)\n沒有解析標籤的說明文字\n答案：(C)\n解析：第二題",
+    "答案：(A)\n解析：跨行解析\n第二行\n第三行\n答案：(B)",
+    "答案：(E)\n解析：超出 A-D 的選項",
+    "答案：A\n解析：沒有括號",
+    "題目中提到答案：(A) 的字樣\n解析：題幹含有答案字樣",
+    "答案：(A)\n解析：說明中提到 答案：(B) 的字樣",
+    "12. 答案 : (1)(Ａ)；(2)(Ｃ)\n解析 ：全形冒號前有空白",
+    "解析：沒有答案的解析\n答案：(A)",
+]
+
+_STEMS = ["下列何者正確？", "關於此實驗的敘述，何者錯誤？", "承上題，若溫度上升則：", "計算 x 的值："]
+_EXPLANATION_WORDS = ["因為", "由題意可知", "代入公式", "故選", "牛頓第二定律", "莫耳數", "→", "F=ma", "(A) 錯誤", "選項"]
+
+
+def _letter(rng: random.Random, full_width: bool, letters: str = "ABCD") -> str:
+    letter = rng.choice(letters)
+    return chr(ord(letter) + 0xFEE0) if full_width else letter
+
+
+def _answer_line(rng: random.Random, number: int) -> str:
+    colon = rng.choice(['：', ':', ' : ', '： ', ' ：'])
+    left, right = rng.choice([('(', ')'), ('（', '）')])
+    full_width = rng.random() < 0.4
+    if rng.random() < 0.25:
+        parts = []
+        for sub in range(1, rng.randint(2, 3) + 1):
+            sub_label = chr(ord(str(sub)) + 0xFEE0) if rng.random() < 0.3 else str(sub)
+            parts.append(f"{left}{sub_label}{right}{left}{_letter(rng, full_width)}{right}")
+        body = rng.choice(['；', '; ', ';']).join(parts)
+    else:
+        body = f"{left}{_letter(rng, full_width)}{right}"
+    prefix = f"{number}. " if rng.random() < 0.3 else ""
+    return f"{prefix}答案{colon}{body}"
+
+
+def _explanation_lines(rng: random.Random) -> List[str]:
+    label = rng.choice(['解析：', '解析:', '解析 :', '解析 ：', '解析： '])
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        lines.append("".join(rng.choice(_EXPLANATION_WORDS) for _ in range(rng.randint(1, 5))))
+    lines[0] = label + lines[0]
+    return lines
+
+
+def generate_exam(rng: random.Random, questions: Optional[int] = None) -> str:
+    """產生一份隨機解析卷文字"""
+    lines = []
+    for number in range(1, (questions or rng.randint(1, 12)) + 1):
+        if rng.random() < 0.6:
+            lines.append(f"{number}. {rng.choice(_STEMS)}")
+            lines.append("(A) 甲 (B) 乙 (C) 丙 (D) 丁")
+        lines.append(_answer_line(rng, number))
+        if rng.random() < 0.85:
+            for line in _explanation_lines(rng):
+                lines.append(line)
+                if rng.random() < 0.15:
+                    lines.append("")
+        if rng.random() < 0.2:
+            lines.append("   ")
+    return "\n".join(lines) + "\n"
+
+
+def generate_cases(seed: int, count: int) -> List[str]:
+    rng = random.Random(seed)
+    return ADVERSARIAL_CASES + [generate_exam(rng) for _ in range(count)]
+
+
+def normalize(questions: List[Question]) -> List[Question]:
+    """套用填寫時相同的清理方式，比較實際寫入解答卷的內容"""
+    normalized = []
+    for question, answer, explanation in questions:
+        answer = answer.replace('答案：', '').replace('答案:', '').strip()
+        explanation = explanation.replace('解析：', '').replace('解析:', '').strip()
+        normalized.append((question, answer, explanation))
+    return normalized
+
+
+def _doc_engine() -> Engine:
+    from word_form_filler_doc import HeadlessWordFormFiller
+    return HeadlessWordFormFiller()._parse_questions_from_text
+
+
+def _docx_engine() -> Engine:
+    from word_form_filler import WordFormFiller
+
+    class _Headless(WordFormFiller):
+        def __init__(self):
+            pass
+
+        def log_message(self, message):
+            pass
+
+    return _Headless()._parse_questions_from_text
+
+
+def _test_parser_engine() -> Engine:
+    from test_parser import parse_questions_from_text
+
+    def parse(text: str) -> List[Question]:
+        # test_parser 會逐題 print，比對時不需要這些輸出
+        with contextlib.redirect_stdout(io.StringIO()):
+            return parse_questions_from_text(text)
+    return parse
+
+
+BUILTIN_ENGINES: Dict[str, Callable[[], Engine]] = {
+    'doc': _doc_engine,
+    'docx': _docx_engine,
+    'test_parser': _test_parser_engine,
+}
+
+
+def load_engine(spec: str) -> Engine:
+    """載入內建引擎或 module:function 形式的解析函式"""
+    if spec in BUILTIN_ENGINES:
+        return BUILTIN_ENGINES[spec]()
+    module_name, _, function_name = spec.partition(':')
+    if not function_name:
+        raise ValueError(f"未知的引擎: {spec} (請使用內建名稱或 module:function)")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def first_divergence(expected: List[Question], actual: List[Question]) -> Optional[int]:
+    """回傳第一筆不同紀錄的索引，完全相同時回傳 None"""
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return index
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual))
+    return None
+
+
+def measure_throughput(engine: Engine, cases: List[str], repeat: int) -> Tuple[float, int]:
+    """回傳 (每秒處理的 UTF-8 位元組數, 解析出的題目數)"""
+    total_bytes = sum(len(case.encode('utf-8')) for case in cases) * repeat
+    questions = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            questions += len(engine(case))
+    elapsed = time.perf_counter() - start
+    return (total_bytes / elapsed if elapsed else float('inf')), questions
+
+
+def compare(engines: List[str], cases: List[str], raw: bool = False) -> Dict[str, Optional[Tuple]]:
+    """比對各引擎與參考解析器，回傳 {引擎: (案例索引, 紀錄索引, 預期, 實際) 或 None}"""
+    reference = load_engine(REFERENCE_ENGINE)
+    prepare = (lambda q: list(q)) if raw else normalize
+    expected_results = [prepare(reference(case)) for case in cases]
+
+    results = {}
+    for name in engines:
+        engine = load_engine(name)
+        results[name] = None
+        for case_index, (case, expected) in enumerate(zip(cases, expected_results)):
+            actual = prepare(engine(case))
+            index = first_divergence(expected, actual)
+            if index is not None:
+                results[name] = (
+                    case_index, index,
+                    expected[index] if index < len(expected) else None,
+                    actual[index] if index < len(actual) else None,
+                )
+                break
+    return results
+
+
+def _show_case(case: str, limit: int = 12):
+    lines = case.split('\n')
+    for line_number, line in enumerate(lines[:limit], 1):
+        print(f"      {line_number:>3} | {line}")
+    if len(lines) > limit:
+        print(f"      ... 共 {len(lines)} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析器差異比對")
+    parser.add_argument('--engines', default=','.join(name for name in BUILTIN_ENGINES if name != REFERENCE_ENGINE),
+                        help="要比對的引擎，以逗號分隔 (內建名稱或 module:function)")
+    parser.add_argument('--cases', type=int, default=500, help="隨機案例數量")
+    parser.add_argument('--seed', type=int, default=0, help="隨機種子")
+    parser.add_argument('--repeat', type=int, default=3, help="測量速度時重複執行的次數")
+    parser.add_argument('--raw', action='store_true', help="比較原始輸出，不套用填寫時的清理")
+    args = parser.parse_args()
+
+    engines = [name.strip() for name in args.engines.split(',') if name.strip()]
+    cases = generate_cases(args.seed, args.cases)
+    print(f"案例: {len(ADVERSARIAL_CASES)} 個刁鑽案例 + {args.cases} 個隨機案例 (seed={args.seed})")
+
+    diverged = False
+    for name, divergence in compare(engines, cases, args.raw).items():
+        if divergence is None:
+            print(f"[一致] {name}")
+            continue
+        diverged = True
+        case_index, record_index, expected, actual = divergence
+        kind = "刁鑽案例" if case_index < len(ADVERSARIAL_CASES) else "隨機案例"
+        print(f"[分歧] {name}: 第 {case_index} 個案例 ({kind}) 的第 {record_index + 1} 筆紀錄")
+        print(f"    預期 ({REFERENCE_ENGINE}): {expected}")
+        print(f"    實際 ({name}): {actual}")
+        _show_case(cases[case_index])
+
+    print("\n處理速度:")
+    for name in dict.fromkeys([REFERENCE_ENGINE] + engines):
+        bytes_per_second, questions = measure_throughput(load_engine(name), cases, args.repeat)
+        print(f"    {name:<20} {bytes_per_second / 1e6:8.2f} MB/s (UTF-8)  {questions} 題")
+
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
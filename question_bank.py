@@ -0,0 +1,203 @@
+"""
+題庫資料庫
+
+將解析出的題目 (題序、答案、解析) 存入本機 SQLite，並以 FTS5 建立答案與解析的全文索引，
+可快速搜尋歷年所有處理過的解析卷，不必重新開啟文件。
+
+    python question_bank.py index --db bank.db 解析卷1.docx 解析卷2.doc ...
+    python question_bank.py search --db bank.db 牛頓 第二定律
+    python question_bank.py search --db bank.db --column explanation 氧化還原
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    question_count INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    source_hash TEXT NOT NULL REFERENCES sources (hash),
+    number TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    UNIQUE (source_hash, number)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5 (answer, explanation);
+"""
+
+# 中日文字元逐字切開，讓 unicode61 斷詞器可以搜尋任意長度的詞
+_CJK_CHAR = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])')
+
+# 索引時每批提交的來源數量
+INDEX_BATCH_SIZE = 50
+
+
+def _segment(text: str) -> str:
+    return _CJK_CHAR.sub(r' \1 ', text)
+
+
+def file_hash(path: str) -> str:
+    """以檔案內容計算來源雜湊，相同內容的解析卷只會收錄一次"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_match_query(terms: Iterable[str], column: Optional[str] = None) -> str:
+    """將使用者輸入的關鍵字轉為 FTS5 查詢，每個關鍵字視為一個片語"""
+    phrases = []
+    for term in terms:
+        tokens = _segment(term).split()
+        if tokens:
+            phrase = '"' + " ".join(tokens).replace('"', '""') + '"'
+            phrases.append(f"{column} : {phrase}" if column else phrase)
+    return " AND ".join(phrases)
+
+
+class QuestionBank:
+    """題庫資料庫的存取介面"""
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def has_source(self, source_hash: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM sources WHERE hash = ?", (source_hash,)).fetchone() is not None
+
+    def add_sources(self, entries: List[Tuple[str, str, List[Tuple[str, str, str]]]]) -> int:
+        """在單一交易中寫入多份解析卷 [(雜湊, 路徑, 題目)]，已收錄的來源會被取代"""
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for source_hash, path, questions in entries:
+                self._delete_source(source_hash)
+                self.conn.execute("INSERT INTO sources (hash, path, question_count, added_at) VALUES (?, ?, ?, ?)",
+                                  (source_hash, os.path.abspath(path), len(questions), time.time()))
+                for number, answer, explanation in questions:
+                    cursor = self.conn.execute(
+                        "INSERT INTO questions (source_hash, number, answer, explanation) VALUES (?, ?, ?, ?)",
+                        (source_hash, number, answer, explanation))
+                    self.conn.execute("INSERT INTO questions_fts (rowid, answer, explanation) VALUES (?, ?, ?)",
+                                      (cursor.lastrowid, _segment(answer), _segment(explanation)))
+                    added += 1
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def add_source(self, path: str, questions: List[Tuple[str, str, str]],
+                   source_hash: Optional[str] = None) -> int:
+        return self.add_sources([(source_hash or file_hash(path), path, questions)])
+
+    def _delete_source(self, source_hash: str):
+        self.conn.execute("DELETE FROM questions_fts WHERE rowid IN "
+                          "(SELECT id FROM questions WHERE source_hash = ?)", (source_hash,))
+        self.conn.execute("DELETE FROM questions WHERE source_hash = ?", (source_hash,))
+        self.conn.execute("DELETE FROM sources WHERE hash = ?", (source_hash,))
+
+    def search(self, terms: Iterable[str], column: Optional[str] = None,
+               limit: int = 50) -> List[Tuple[str, str, str, str]]:
+        """搜尋題目，依相關程度排序，回傳 [(來源路徑, 題序, 答案, 解析)]"""
+        query = build_match_query(terms, column)
+        if not query:
+            return []
+        return self.conn.execute(
+            "SELECT s.path, q.number, q.answer, q.explanation "
+            "FROM questions_fts f "
+            "JOIN questions q ON q.id = f.rowid "
+            "JOIN sources s ON s.hash = q.source_hash "
+            "WHERE questions_fts MATCH ? ORDER BY bm25(questions_fts) LIMIT ?",
+            (query, limit)).fetchall()
+
+    def stats(self) -> Tuple[int, int]:
+        sources = self.conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        questions = self.conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        return sources, questions
+
+
+def index_files(bank: QuestionBank, paths: List[str], force: bool = False):
+    """解析多份解析卷並分批寫入題庫"""
+    from word_form_filler_doc import HeadlessWordFormFiller
+
+    filler = HeadlessWordFormFiller()
+    batch = []
+    try:
+        for path in paths:
+            try:
+                source_hash = file_hash(path)
+            except OSError as e:
+                print(f"無法讀取 {path}: {str(e)}")
+                continue
+            if not force and bank.has_source(source_hash):
+                print(f"略過已收錄: {os.path.basename(path)}")
+                continue
+            questions = filler.parse_source_document(path)
+            print(f"{os.path.basename(path)}: {len(questions)} 題")
+            # 沒有題目的來源也記錄 (題數為 0)，下次不會重複解析；需要重新解析時使用 --force
+            batch.append((source_hash, path, questions))
+            if len(batch) >= INDEX_BATCH_SIZE:
+                bank.add_sources(batch)
+                batch = []
+    finally:
+        # 中途發生錯誤時，已解析的來源仍然寫入
+        if batch:
+            bank.add_sources(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="題庫全文搜尋")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help="解析並收錄解析卷")
+    index_parser.add_argument('--db', required=True, help="題庫資料庫路徑")
+    index_parser.add_argument('--force', action='store_true', help="重新收錄已存在的來源")
+    index_parser.add_argument('sources', nargs='+', help="解析卷檔案")
+
+    search_parser = subparsers.add_parser('search', help="搜尋題目")
+    search_parser.add_argument('--db', required=True, help="題庫資料庫路徑")
+    search_parser.add_argument('--column', choices=['answer', 'explanation'], help="只搜尋指定欄位")
+    search_parser.add_argument('--limit', type=int, default=50, help="最多顯示筆數")
+    search_parser.add_argument('terms', nargs='+', help="關鍵字")
+
+    stats_parser = subparsers.add_parser('stats', help="顯示題庫統計")
+    stats_parser.add_argument('--db', required=True, help="題庫資料庫路徑")
+
+    args = parser.parse_args()
+    bank = QuestionBank(args.db)
+    try:
+        if args.command == 'index':
+            index_files(bank, args.sources, args.force)
+        elif args.command == 'search':
+            start = time.perf_counter()
+            results = bank.search(args.terms, args.column, args.limit)
+            for path, number, answer, explanation in results:
+                print(f"{os.path.basename(path)} {number} 答案: {answer}")
+                if explanation:
+                    print(f"    {explanation[:80]}{'...' if len(explanation) > 80 else ''}")
+            print(f"共 {len(results)} 筆 ({(time.perf_counter() - start) * 1000:.1f} 毫秒)")
+        elif args.command == 'stats':
+            sources, questions = bank.stats()
+            print(f"來源 {sources} 份，題目 {questions} 題")
+    finally:
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
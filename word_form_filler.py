@@ -4,8 +4,12 @@ import os
 from docx import Document
 import re
 from typing import List, Tuple, Optional
+from docx_fragments import FragmentCopier, UnsupportedFragmentError, paragraphs_for_lines
 
 class WordFormFiller:
+    # 是否以原始 XML 搬移解析內容，保留方程式與圖片
+    preserve_xml = False
+
     def __init__(self, root):
         self.root = root
         self.root.title("Word 表格填寫工具")
@@ -14,6 +18,7 @@ class WordFormFiller:
         # 檔案路徑變數
         self.source_file = tk.StringVar()
         self.target_file = tk.StringVar()
+        self.preserve_xml_var = tk.BooleanVar(value=False)
         
         self.setup_ui()
     
@@ -39,22 +44,26 @@ class WordFormFiller:
         ttk.Button(main_frame, text="選擇檔案", 
                   command=self.select_target_file).grid(row=2, column=2, pady=5)
         
+        # 保留格式選項
+        ttk.Checkbutton(main_frame, text="保留解析中的方程式與圖片",
+                        variable=self.preserve_xml_var).grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
         # 處理按鈕
         process_btn = ttk.Button(main_frame, text="開始處理", 
                                command=self.process_files, style="Accent.TButton")
-        process_btn.grid(row=3, column=0, columnspan=3, pady=20)
+        process_btn.grid(row=4, column=0, columnspan=3, pady=20)
         
         # 進度條
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
         
         # 狀態標籤
         self.status_label = ttk.Label(main_frame, text="請選擇檔案後點擊開始處理")
-        self.status_label.grid(row=5, column=0, columnspan=3, pady=10)
+        self.status_label.grid(row=6, column=0, columnspan=3, pady=10)
         
         # 日誌區域
         log_frame = ttk.LabelFrame(main_frame, text="處理日誌", padding="10")
-        log_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        log_frame.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         
         self.log_text = tk.Text(log_frame, height=10, width=70)
         scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
@@ -67,7 +76,7 @@ class WordFormFiller:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(6, weight=1)
+        main_frame.rowconfigure(7, weight=1)
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
     
@@ -98,6 +107,7 @@ class WordFormFiller:
         try:
             doc = Document(doc_path)
             questions = []
+            self.explanation_fragments = {}
             
             self.log_message("正在解析源文檔...")
             
@@ -109,12 +119,39 @@ class WordFormFiller:
             
             questions = self._parse_questions_from_text(full_text)
             
+            if self.preserve_xml:
+                self._collect_explanation_fragments(doc, questions)
+            
             self.log_message(f"成功解析 {len(questions)} 個題目")
             return questions
             
         except Exception as e:
             self.log_message(f"解析源文檔時發生錯誤: {str(e)}")
             return []
+
+    def _collect_explanation_fragments(self, doc, questions: List[Tuple[str, str, str]]):
+        """記錄每題解析對應的原始段落 XML，填寫時直接複製"""
+        paragraphs = doc.paragraphs
+        line_paragraphs = []
+        paragraph_lines = []
+        for index, paragraph in enumerate(paragraphs):
+            text = paragraph.text.strip()
+            lines = []
+            if text:
+                # 與 full_text 的組成方式一致：每個段落的文字可能含有換行
+                for line in text.split('\n'):
+                    if line.strip():
+                        lines.append(len(line_paragraphs))
+                    line_paragraphs.append(index)
+            paragraph_lines.append(lines)
+
+        for (question, _, explanation), line_indices in zip(questions, self.last_explanation_lines):
+            indices = paragraphs_for_lines(line_indices, line_paragraphs, paragraph_lines)
+            if indices is None:
+                continue
+            self.explanation_fragments[question] = (
+                explanation, doc.part, [paragraphs[i]._p for i in indices])
+        self.log_message(f"保留 {len(self.explanation_fragments)} 題解析的原始格式")
     
     def _parse_questions_from_text(self, text: str) -> List[Tuple[str, str, str]]:
         questions = []
@@ -123,8 +160,11 @@ class WordFormFiller:
         current_question_num = 1
         current_answer = None
         current_explanation = None
+        # 每題解析所在的行號，供保留原始格式時對應回段落
+        explanation_lines = []
+        current_explanation_lines = []
         
-        for line in lines:
+        for i, line in enumerate(lines):
             line = line.strip()
             if not line:
                 continue
@@ -140,14 +180,18 @@ class WordFormFiller:
                         current_answer,
                         current_explanation or ""
                     ))
+                    explanation_lines.append(current_explanation_lines)
                     self.log_message(f"解析題目 {current_question_num}.: 答案={current_answer}, 解析={'有' if current_explanation else '無'}")
                     current_question_num += 1
                 current_answer = line
                 current_explanation = None
+                current_explanation_lines = []
             elif re.match(r'^解析：', line) and current_answer:
                 current_explanation = line
+                current_explanation_lines = [i]
             elif current_explanation and current_answer and line:
                 current_explanation += " " + line
+                current_explanation_lines.append(i)
         
         if current_answer:
             questions.append((
@@ -155,8 +199,10 @@ class WordFormFiller:
                 current_answer,
                 current_explanation or ""
             ))
+            explanation_lines.append(current_explanation_lines)
             self.log_message(f"解析題目 {current_question_num}.: 答案={current_answer}, 解析={'有' if current_explanation else '無'}")
         
+        self.last_explanation_lines = explanation_lines
         return questions
 
     def _parse_with_fallback(self, text: str) -> List[Tuple[str, str, str]]:
@@ -219,6 +265,7 @@ class WordFormFiller:
                         cell.text = ""
                 self.log_message(f"表格已擴展到 {len(table.rows)} 行")
             filled_count = 0
+            copier = FragmentCopier(doc.part) if self.preserve_xml else None
             for i, (question, answer, explanation) in enumerate(questions):
                 row_idx = i + 1  # 跳過標題行
                 row = table.rows[row_idx]
@@ -230,7 +277,10 @@ class WordFormFiller:
                     row.cells[1].text = clean_answer
                     self.log_message(f"填寫答案: {clean_answer}")
                 if len(row.cells) > 2:
-                    if explanation and explanation.strip():
+                    if explanation and explanation.strip() and copier and \
+                            self._copy_explanation_fragment(copier, row.cells[2], question, explanation):
+                        self.log_message(f"填寫解析 (保留原始格式): {question}")
+                    elif explanation and explanation.strip():
                         clean_explanation = explanation.replace('解析：', '').replace('解析:', '').strip()
                         row.cells[2].text = clean_explanation
                         self.log_message(f"填寫解析: {clean_explanation[:50]}{'...' if len(clean_explanation) > 50 else ''}")
@@ -249,6 +299,20 @@ class WordFormFiller:
         except Exception as e:
             self.log_message(f"填寫目標文檔時發生錯誤: {str(e)}")
     
+    def _copy_explanation_fragment(self, copier, cell, question: str, explanation: str) -> bool:
+        """以原始段落 XML 填寫解析，無法保留時回傳 False 改用純文字"""
+        fragment = getattr(self, 'explanation_fragments', {}).get(question)
+        # 只有同一次解析產生的題目才會對得上
+        if not fragment or fragment[0] != explanation:
+            return False
+        _, source_part, paragraphs = fragment
+        try:
+            copier.copy_into_cell(cell, source_part, paragraphs)
+            return True
+        except UnsupportedFragmentError as e:
+            self.log_message(f"題目 {question} 無法保留原始格式，改用純文字: {str(e)}")
+            return False
+    
     def process_files(self):
         if not self.source_file.get() or not self.target_file.get():
             messagebox.showerror("錯誤", "請先選擇解析卷和解答卷檔案")
@@ -262,6 +326,7 @@ class WordFormFiller:
             messagebox.showerror("錯誤", "解答卷檔案不存在")
             return
         
+        self.preserve_xml = self.preserve_xml_var.get()
         self.progress.start()
         self.status_label.config(text="正在處理...")
         self.log_text.delete(1.0, tk.END)
@@ -2,22 +2,134 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Emu
+from docx.table import Table
 import re
 from typing import List, Tuple, Optional
 import subprocess
 import tempfile
+import shutil
+import io
+import csv
+import copy
+import glob
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from docx_fragments import FragmentCopier, UnsupportedFragmentError, paragraphs_for_lines
+from question_bank import QuestionBank
+from docx_writer import write_answer_sheet
+from job_queue import default_output_path
+
+# 轉換工具是否存在的快取，避免每份文件都重新嘗試啟動不存在的程式
+_CONVERTER_CACHE = {}
+
+# 快速版面：模板沒有欄寬時各欄所佔比例 (題序/答案/解析)
+FAST_LAYOUT_RATIOS = (0.12, 0.18, 0.70)
+# 快速版面：解析不超過此字數的列設為不跨頁分割
+CANT_SPLIT_MAX_CHARS = 300
+# 快速版面：表格儲存格共用的段落樣式
+TABLE_CELL_STYLE = '答案表格'
+# 緊湊版面：模板標題列中用來辨識重複欄組的文字
+PACKED_NUMBER_HEADER = '題序'
+PACKED_ANSWER_HEADER = '答案'
+# w:tblPr 中排在 w:tblW 之後的元素，插入 w:tblW 時需放在它們之前
+_TBLW_SUCCESSORS = ('w:jc', 'w:tblCellSpacing', 'w:tblInd', 'w:tblBorders', 'w:shd',
+                    'w:tblLayout', 'w:tblCellMar', 'w:tblLook', 'w:tblCaption', 'w:tblDescription')
+# 批次佇列：檢查背景工作是否完成的間隔 (毫秒)
+QUEUE_POLL_MS = 200
+# 批次佇列的工作狀態
+JOB_PENDING = '等待中'
+JOB_RUNNING = '處理中'
+JOB_DONE = '完成'
+JOB_FAILED = '失敗'
+# 轉換工具輸出編碼偵測：只取開頭這麼多位元組判斷，避免大檔案重複解碼
+ENCODING_SAMPLE_SIZE = 65536
+# 繁簡中文常用字與解析卷常見字，用來判斷 Big5/CP950 與 GBK 哪個解碼結果合理
+_COMMON_CJK_CHARS = ('的一是不了在人有我他中大上以可也子之年自所然能而要出同生作地成就用'
+                     '答案解析選选項项題题正確确錯错故因為为個个這这們们來来說说時时會会對对'
+                     '於于過过發发後后種种經经學学現现當当動动還还進进點点關关實实與与')
+
+def decode_converter_output(data: bytes) -> Tuple[str, str]:
+    """將轉換工具輸出的位元組解碼一次，回傳 (文字, 編碼)
+
+    依序判斷 BOM、無 BOM 的 UTF-16、UTF-8，最後在 Big5/CP950 與 GBK 之間
+    以常用字出現次數決定，結果只取決於輸入內容。
+    """
+    if data.startswith(b'\xef\xbb\xbf'):
+        return data[3:].decode('utf-8', errors='replace'), 'utf-8-sig'
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16', errors='replace'), 'utf-16'
+    
+    sample = data[:ENCODING_SAMPLE_SIZE]
+    # 無 BOM 的 UTF-16：ASCII 字元的另一個位元組為 0，且集中在同一側
+    even_zeros = sample[0::2].count(0)
+    odd_zeros = sample[1::2].count(0)
+    if max(even_zeros, odd_zeros) > len(sample) // 20 and min(even_zeros, odd_zeros) * 4 < max(even_zeros, odd_zeros):
+        encoding = 'utf-16-le' if odd_zeros > even_zeros else 'utf-16-be'
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            pass
+    
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    
+    # 錯誤的雙位元組編碼解出的多為罕用字，常用字數量明顯較少；同分時以 CP950 優先
+    scores = []
+    for encoding in ('cp950', 'gbk'):
+        text = sample.decode(encoding, errors='ignore')
+        scores.append((sum(text.count(char) for char in _COMMON_CJK_CHARS), encoding))
+    ranked = [encoding for _, encoding in sorted(scores, key=lambda item: -item[0])]
+    for encoding in ranked:
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    # 都無法完整解碼時保留替代字元，不默默丟棄內容
+    return data.decode(ranked[0], errors='replace'), ranked[0]
 
 class WordFormFiller:
+    # 是否以原始 XML 搬移解析內容 (僅 .docx 解析卷)，保留方程式與圖片
+    preserve_xml = False
+    # 題庫資料庫路徑，設定後每次解析結果都會寫入題庫
+    question_bank_path = None
+    # 是否輸出固定欄寬、不自動調整的表格，讓 Word 開啟大型文件時不必重新量測每一列
+    fast_layout = False
+    # 快速版面時儲存格使用的段落樣式 ID，字體統一由樣式提供
+    _cell_style = None
+    # 是否以緊湊版面填寫：每列放多題 (重複的 題序/答案 欄組)，解析另列於附錄
+    packed_layout = False
+    # 緊湊版面時是否輸出解析附錄
+    packed_appendix = True
+
     def __init__(self, root):
         self.root = root
         self.root.title("Word 表格填寫工具")
-        self.root.geometry("600x400")
+        self.root.geometry("800x700")
         
         # 檔案路徑變數
         self.source_file = tk.StringVar()
         self.target_file = tk.StringVar()
+        self.chunk_size = tk.IntVar(value=0)
+        self.fast_layout_var = tk.BooleanVar(value=False)
+        self.packed_layout_var = tk.BooleanVar(value=False)
+        self.packed_appendix_var = tk.BooleanVar(value=True)
+        self.worker_count = tk.IntVar(value=min(4, os.cpu_count() or 1))
+        
+        # 批次佇列：Treeview 項目 ID -> 工作資料
+        self.queue_jobs = {}
+        self.executor = None
+        self.executor_workers = 0
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def setup_ui(self):
         # 主框架
@@ -36,29 +148,75 @@ class WordFormFiller:
                   command=self.select_source_file).grid(row=1, column=2, pady=5)
         
         # 解答卷檔案選擇
-        ttk.Label(main_frame, text="解答卷檔案 (僅支援 .docx):").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="解答卷檔案 (.docx，可留空):").grid(row=2, column=0, sticky=tk.W, pady=5)
         ttk.Entry(main_frame, textvariable=self.target_file, width=50).grid(row=2, column=1, padx=5, pady=5)
         ttk.Button(main_frame, text="選擇檔案", 
                   command=self.select_target_file).grid(row=2, column=2, pady=5)
         
+        # 輸出選項
+        options_frame = ttk.Frame(main_frame)
+        options_frame.grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=5)
+        ttk.Label(options_frame, text="每份題數 (0 為不分檔):").grid(row=0, column=0, sticky=tk.W)
+        ttk.Spinbox(options_frame, from_=0, to=10000, increment=50, textvariable=self.chunk_size,
+                    width=8).grid(row=0, column=1, sticky=tk.W, padx=5)
+        ttk.Checkbutton(options_frame, text="快速開啟版面",
+                        variable=self.fast_layout_var).grid(row=0, column=2, sticky=tk.W, padx=5)
+        ttk.Checkbutton(options_frame, text="緊湊答案版面",
+                        variable=self.packed_layout_var).grid(row=0, column=3, sticky=tk.W, padx=5)
+        ttk.Checkbutton(options_frame, text="緊湊版面附上解析附錄",
+                        variable=self.packed_appendix_var).grid(row=0, column=4, sticky=tk.W, padx=5)
+        
         # 處理按鈕
         process_btn = ttk.Button(main_frame, text="開始處理", 
                                command=self.process_files, style="Accent.TButton")
-        process_btn.grid(row=3, column=0, columnspan=3, pady=20)
+        process_btn.grid(row=4, column=0, columnspan=3, pady=20)
         
         # 進度條
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
         
         # 狀態標籤
         self.status_label = ttk.Label(main_frame, text="請選擇檔案後點擊開始處理")
-        self.status_label.grid(row=5, column=0, columnspan=3, pady=10)
+        self.status_label.grid(row=6, column=0, columnspan=3, pady=10)
+        
+        # 批次佇列：多份解析卷在背景程序中同時處理，視窗不會停止回應
+        queue_frame = ttk.LabelFrame(main_frame, text="批次佇列", padding="10")
+        queue_frame.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        
+        queue_buttons = ttk.Frame(queue_frame)
+        queue_buttons.grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        ttk.Button(queue_buttons, text="加入解析卷",
+                   command=self.add_queue_files).grid(row=0, column=0, padx=(0, 5))
+        ttk.Button(queue_buttons, text="加入資料夾",
+                   command=self.add_queue_folder).grid(row=0, column=1, padx=5)
+        ttk.Button(queue_buttons, text="開始佇列",
+                   command=self.start_queue).grid(row=0, column=2, padx=5)
+        ttk.Button(queue_buttons, text="重試失敗",
+                   command=self.retry_failed_jobs).grid(row=0, column=3, padx=5)
+        ttk.Button(queue_buttons, text="移除已完成",
+                   command=self.clear_finished_jobs).grid(row=0, column=4, padx=5)
+        ttk.Label(queue_buttons, text="同時處理數:").grid(row=0, column=5, padx=(15, 0))
+        ttk.Spinbox(queue_buttons, from_=1, to=os.cpu_count() or 1, textvariable=self.worker_count,
+                    width=4).grid(row=0, column=6, padx=5)
+        
+        columns = ('source', 'target', 'state', 'elapsed', 'output')
+        self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show='headings', height=6)
+        for column, heading, width in zip(columns, ("解析卷", "解答卷", "狀態", "耗時", "輸出檔案"),
+                                          (150, 150, 60, 60, 250)):
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width, stretch=column in ('source', 'output'))
+        queue_scrollbar = ttk.Scrollbar(queue_frame, orient="vertical", command=self.queue_tree.yview)
+        self.queue_tree.configure(yscrollcommand=queue_scrollbar.set)
+        self.queue_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        queue_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        queue_frame.columnconfigure(0, weight=1)
+        queue_frame.rowconfigure(1, weight=1)
         
         # 日誌區域
         log_frame = ttk.LabelFrame(main_frame, text="處理日誌", padding="10")
-        log_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        log_frame.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         
-        self.log_text = tk.Text(log_frame, height=10, width=70)
+        self.log_text = tk.Text(log_frame, height=8, width=70)
         scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
         self.log_text.configure(yscrollcommand=scrollbar.set)
         
@@ -69,14 +227,19 @@ class WordFormFiller:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(6, weight=1)
+        main_frame.rowconfigure(7, weight=1)
+        main_frame.rowconfigure(8, weight=1)
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
     
     def log_message(self, message):
+        self._append_log(message)
+        self.root.update()
+    
+    def _append_log(self, message):
+        # 不處理待辦事件，供 after 回呼等不可重入的地方使用
         self.log_text.insert(tk.END, f"{message}\n")
         self.log_text.see(tk.END)
-        self.root.update()
     
     def select_source_file(self):
         filename = filedialog.askopenfilename(
@@ -99,6 +262,8 @@ class WordFormFiller:
     def parse_source_document(self, doc_path: str) -> List[Tuple[str, str, str]]:
         try:
             questions = []
+            doc = None
+            self.explanation_fragments = {}
             
             self.log_message("正在解析源文檔...")
             
@@ -123,22 +288,66 @@ class WordFormFiller:
             
             questions = self._parse_questions_from_text(full_text)
             
+            if self.preserve_xml and doc is not None:
+                self._collect_explanation_fragments(doc, questions)
+            
+            if self.question_bank_path and questions:
+                self._save_to_question_bank(doc_path, questions)
+            
             self.log_message(f"成功解析 {len(questions)} 個題目")
             return questions
             
         except Exception as e:
             self.log_message(f"解析源文檔時發生錯誤: {str(e)}")
             return []
+
+    def _save_to_question_bank(self, doc_path: str, questions: List[Tuple[str, str, str]]):
+        """將解析結果寫入題庫，失敗時不影響填寫流程"""
+        try:
+            bank = QuestionBank(self.question_bank_path)
+            try:
+                bank.add_source(doc_path, questions)
+            finally:
+                bank.close()
+            self.log_message(f"已寫入題庫: {len(questions)} 題")
+        except Exception as e:
+            self.log_message(f"寫入題庫時發生錯誤: {str(e)}")
+
+    def _collect_explanation_fragments(self, doc, questions: List[Tuple[str, str, str]]):
+        """記錄每題解析對應的原始段落 XML，填寫時直接複製"""
+        paragraphs = doc.paragraphs
+        line_paragraphs = []
+        paragraph_lines = []
+        for index, paragraph in enumerate(paragraphs):
+            text = paragraph.text.strip()
+            lines = []
+            if text:
+                # 與 full_text 的組成方式一致：每個段落的文字可能含有換行
+                for line in text.split('\n'):
+                    if line.strip():
+                        lines.append(len(line_paragraphs))
+                    line_paragraphs.append(index)
+            paragraph_lines.append(lines)
+
+        for (question, _, explanation), line_indices in zip(questions, self.last_explanation_lines):
+            indices = paragraphs_for_lines(line_indices, line_paragraphs, paragraph_lines)
+            if indices is None:
+                continue
+            self.explanation_fragments[question] = (
+                explanation, doc.part, [paragraphs[i]._p for i in indices])
+        self.log_message(f"保留 {len(self.explanation_fragments)} 題解析的原始格式")
     
     def _read_doc_file(self, doc_path: str) -> str:
         """讀取 .doc 檔案的內容"""
         # 方法1: 嘗試使用 antiword (Linux/Mac)
         try:
+            self._require_converter('antiword')
             result = subprocess.run(['antiword', doc_path], 
-                                  capture_output=True, text=True, timeout=30)
+                                  capture_output=True, timeout=30)
             if result.returncode == 0:
-                self.log_message("使用 antiword 成功讀取 .doc 檔案")
-                return result.stdout
+                text, encoding = decode_converter_output(result.stdout)
+                self.log_message(f"使用 antiword 成功讀取 .doc 檔案 (編碼: {encoding})")
+                return text
         except FileNotFoundError:
             self.log_message("antiword 未安裝，嘗試其他方法...")
         except Exception as e:
@@ -146,11 +355,13 @@ class WordFormFiller:
         
         # 方法2: 嘗試使用 catdoc (Linux/Mac)
         try:
+            self._require_converter('catdoc')
             result = subprocess.run(['catdoc', doc_path], 
-                                  capture_output=True, text=True, timeout=30)
+                                  capture_output=True, timeout=30)
             if result.returncode == 0:
-                self.log_message("使用 catdoc 成功讀取 .doc 檔案")
-                return result.stdout
+                text, encoding = decode_converter_output(result.stdout)
+                self.log_message(f"使用 catdoc 成功讀取 .doc 檔案 (編碼: {encoding})")
+                return text
         except FileNotFoundError:
             self.log_message("catdoc 未安裝，嘗試其他方法...")
         except Exception as e:
@@ -158,6 +369,7 @@ class WordFormFiller:
         
         # 方法3: 嘗試使用 LibreOffice (跨平台)
         try:
+            self._require_converter('libreoffice')
             # 創建臨時檔案
             with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as temp_file:
                 temp_path = temp_file.name
@@ -166,7 +378,7 @@ class WordFormFiller:
             result = subprocess.run([
                 'libreoffice', '--headless', '--convert-to', 'txt', 
                 '--outdir', os.path.dirname(temp_path), doc_path
-            ], capture_output=True, text=True, timeout=60)
+            ], capture_output=True, timeout=60)
             
             if result.returncode == 0:
                 # 讀取轉換後的文字檔案
@@ -174,11 +386,11 @@ class WordFormFiller:
                 txt_path = os.path.join(os.path.dirname(temp_path), f"{base_name}.txt")
                 
                 if os.path.exists(txt_path):
-                    with open(txt_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
+                    with open(txt_path, 'rb') as f:
+                        content, encoding = decode_converter_output(f.read())
                     os.unlink(txt_path)  # 清理臨時檔案
                     os.unlink(temp_path)
-                    self.log_message("使用 LibreOffice 成功讀取 .doc 檔案")
+                    self.log_message(f"使用 LibreOffice 成功讀取 .doc 檔案 (編碼: {encoding})")
                     return content
         except FileNotFoundError:
             self.log_message("LibreOffice 未安裝，嘗試其他方法...")
@@ -187,11 +399,13 @@ class WordFormFiller:
         
         # 方法4: 嘗試使用 pandoc (跨平台)
         try:
+            self._require_converter('pandoc')
             result = subprocess.run(['pandoc', doc_path, '-t', 'plain'], 
-                                  capture_output=True, text=True, timeout=30)
+                                  capture_output=True, timeout=30)
             if result.returncode == 0:
-                self.log_message("使用 pandoc 成功讀取 .doc 檔案")
-                return result.stdout
+                text, encoding = decode_converter_output(result.stdout)
+                self.log_message(f"使用 pandoc 成功讀取 .doc 檔案 (編碼: {encoding})")
+                return text
         except FileNotFoundError:
             self.log_message("pandoc 未安裝")
         except Exception as e:
@@ -208,6 +422,13 @@ class WordFormFiller:
         self.log_message(error_msg)
         return error_msg
 
+    def _require_converter(self, name: str):
+        """確認轉換工具存在，不存在時拋出 FileNotFoundError"""
+        if name not in _CONVERTER_CACHE:
+            _CONVERTER_CACHE[name] = shutil.which(name) is not None
+        if not _CONVERTER_CACHE[name]:
+            raise FileNotFoundError(name)
+
     def _parse_questions_from_text(self, text: str) -> List[Tuple[str, str, str]]:
         questions = []
         lines = text.split('\n')
@@ -217,6 +438,9 @@ class WordFormFiller:
         current_question_num = 1
         current_answer = None
         current_explanation = None
+        # 每題解析所在的行號，供保留原始格式時對應回段落
+        explanation_lines = []
+        current_explanation_lines = []
         
         for i, line in enumerate(lines):
             line = line.strip()
@@ -242,16 +466,20 @@ class WordFormFiller:
                         clean_answer,
                         current_explanation or ""
                     ))
+                    explanation_lines.append(current_explanation_lines)
                     self.log_message(f"解析題目 {current_question_num}.: 答案={clean_answer}, 解析={'有' if current_explanation else '無'}")
                     current_question_num += 1
                 current_answer = line
                 current_explanation = None
+                current_explanation_lines = []
             elif re.search(r'解析\s*[：:]', line) and current_answer:
                 self.log_message(f"找到解析行: {line}")
                 # 清理解析內容，移除「解析：」標籤
                 current_explanation = re.sub(r'^解析\s*[：:]\s*', '', line)
+                current_explanation_lines = [i]
             elif current_explanation and current_answer and line:
                 current_explanation += " " + line
+                current_explanation_lines.append(i)
         
         if current_answer:
             # 清理最後一個答案內容
@@ -261,8 +489,10 @@ class WordFormFiller:
                 clean_answer,
                 current_explanation or ""
             ))
+            explanation_lines.append(current_explanation_lines)
             self.log_message(f"解析題目 {current_question_num}.: 答案={clean_answer}, 解析={'有' if current_explanation else '無'}")
         
+        self.last_explanation_lines = explanation_lines
         return questions
 
     def _clean_answer(self, answer: str) -> str:
@@ -290,9 +520,14 @@ class WordFormFiller:
             # 設定文字
             run = paragraph.add_run(processed_text)
             
-            # 設定字體為標楷體，避免 Wingdings 亂碼
-            run.font.name = '標楷體'
-            run.font.size = None  # 保持原有大小
+            if self._cell_style is not None:
+                # 快速版面：字體由段落樣式統一提供，不在每個 run 重複寫入
+                # 直接寫入樣式 ID，避免 python-docx 每次重新查找樣式
+                paragraph._p.style = self._cell_style
+            else:
+                # 設定字體為標楷體，避免 Wingdings 亂碼
+                run.font.name = '標楷體'
+                run.font.size = None  # 保持原有大小
             
             self.log_message(f"設定文字: {processed_text[:30]}{'...' if len(processed_text) > 30 else ''}")
             
@@ -362,68 +597,407 @@ class WordFormFiller:
         
         return questions
     
-    def fill_target_document(self, target_path: str, questions: List[Tuple[str, str, str]]):
+    def fill_target_document(self, target_path: str, questions: List[Tuple[str, str, str]],
+                             output_path: Optional[str] = None) -> Optional[str]:
         try:
             doc = Document(target_path)
             
             self.log_message("正在填寫目標文檔...")
             
-            # 尋找表格
+            filled_count = self._fill_table(doc, questions)
+            if filled_count is None:
+                return None
+            
+            if output_path is None:
+                output_path = target_path.replace('.docx', '_已填寫.docx')
+            doc.save(output_path)
+            
+            self.log_message(f"成功填寫 {filled_count} 個題目")
+            self.log_message(f"已保存到: {os.path.basename(output_path)}")
+            return output_path
+            
+        except Exception as e:
+            self.log_message(f"填寫目標文檔時發生錯誤: {str(e)}")
+            return None
+    
+    def fill_target_document_chunked(self, target_path: str, questions: List[Tuple[str, str, str]],
+                                     chunk_size: int, output_dir: Optional[str] = None) -> List[str]:
+        """每 chunk_size 題以模板建立一份文件並立即保存，另外輸出題目與檔案的對照索引"""
+        try:
+            self.log_message(f"正在分檔填寫目標文檔，每份 {chunk_size} 題...")
+            
+            # 模板只讀取一次，每份文件都從記憶體中的模板重新建立
+            with open(target_path, 'rb') as f:
+                template = f.read()
+            base_name = os.path.splitext(os.path.basename(target_path))[0]
+            directory = output_dir or os.path.dirname(os.path.abspath(target_path))
+            total_parts = (len(questions) + chunk_size - 1) // chunk_size
+            
+            outputs = []
+            index_rows = []
+            for part, start in enumerate(range(0, len(questions), chunk_size), 1):
+                chunk = questions[start:start + chunk_size]
+                doc = Document(io.BytesIO(template))
+                if self._fill_table(doc, chunk) is None:
+                    return outputs
+                output_path = os.path.join(directory, f"{base_name}_已填寫_{part:03d}.docx")
+                doc.save(output_path)
+                # 保存後即釋放，記憶體用量不隨總題數成長
+                del doc
+                outputs.append(output_path)
+                index_rows.append((os.path.basename(output_path), chunk[0][0], chunk[-1][0], len(chunk)))
+                self.log_message(f"已保存第 {part}/{total_parts} 份: {os.path.basename(output_path)}")
+            
+            index_path = os.path.join(directory, f"{base_name}_已填寫_索引.csv")
+            self._write_chunk_index(index_path, index_rows)
+            
+            self.log_message(f"成功填寫 {len(questions)} 個題目，共 {len(outputs)} 份文件")
+            self.log_message(f"索引已保存到: {os.path.basename(index_path)}")
+            return outputs
+            
+        except Exception as e:
+            self.log_message(f"分檔填寫目標文檔時發生錯誤: {str(e)}")
+            return []
+    
+    def _write_chunk_index(self, index_path: str, index_rows: List[Tuple[str, str, str, int]]):
+        """輸出分檔的題目與檔案對照索引 (加上 BOM 讓 Excel 正確辨識)"""
+        with open(index_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['檔案', '起始題序', '結束題序', '題數'])
+            writer.writerows(index_rows)
+    
+    def _warn_template_free_options(self):
+        """內建格式固定為 題序/答案/解析 純文字表格，提醒不適用的選項"""
+        if self.packed_layout:
+            self.log_message("警告: 內建格式不支援緊湊答案版面，改用 題序/答案/解析 表格")
+        if self.preserve_xml:
+            self.log_message("警告: 內建格式不保留解析中的方程式與圖片，只輸出文字")
+    
+    def _answer_sheet_rows(self, questions: List[Tuple[str, str, str]]):
+        return (
+            (question,
+             self._process_wingdings_text(answer.replace('答案：', '').replace('答案:', '').strip()),
+             self._process_wingdings_text(explanation.replace('解析：', '').replace('解析:', '').strip()))
+            for question, answer, explanation in questions
+        )
+    
+    def generate_answer_sheet(self, questions: List[Tuple[str, str, str]], output_path: str) -> Optional[str]:
+        """不使用模板，以內建寫入器直接產生 題序/答案/解析 表格"""
+        try:
+            self.log_message("未指定解答卷，以內建格式產生解答卷...")
+            self._warn_template_free_options()
+            count = write_answer_sheet(output_path, self._answer_sheet_rows(questions))
+            self.log_message(f"成功填寫 {count} 個題目")
+            self.log_message(f"已保存到: {os.path.basename(output_path)}")
+            return output_path
+        except Exception as e:
+            self.log_message(f"產生解答卷時發生錯誤: {str(e)}")
+            return None
+    
+    def generate_answer_sheet_chunked(self, questions: List[Tuple[str, str, str]], output_path: str,
+                                      chunk_size: int) -> List[str]:
+        """不使用模板，每 chunk_size 題產生一份解答卷，另外輸出題目與檔案的對照索引"""
+        try:
+            self.log_message(f"未指定解答卷，以內建格式分檔產生解答卷，每份 {chunk_size} 題...")
+            self._warn_template_free_options()
+            base_path = os.path.splitext(output_path)[0]
+            total_parts = (len(questions) + chunk_size - 1) // chunk_size
+            
+            outputs = []
+            index_rows = []
+            for part, start in enumerate(range(0, len(questions), chunk_size), 1):
+                chunk = questions[start:start + chunk_size]
+                part_path = f"{base_path}_{part:03d}.docx"
+                write_answer_sheet(part_path, self._answer_sheet_rows(chunk))
+                outputs.append(part_path)
+                index_rows.append((os.path.basename(part_path), chunk[0][0], chunk[-1][0], len(chunk)))
+                self.log_message(f"已保存第 {part}/{total_parts} 份: {os.path.basename(part_path)}")
+            
+            index_path = f"{base_path}_索引.csv"
+            self._write_chunk_index(index_path, index_rows)
+            
+            self.log_message(f"成功填寫 {len(questions)} 個題目，共 {len(outputs)} 份文件")
+            self.log_message(f"索引已保存到: {os.path.basename(index_path)}")
+            return outputs
+        except Exception as e:
+            self.log_message(f"分檔產生解答卷時發生錯誤: {str(e)}")
+            return []
+    
+    def fill_merged_document(self, target_path: str, sections: List[Tuple[str, List[Tuple[str, str, str]]]],
+                             output_path: str) -> Optional[str]:
+        """將多份解析卷依序組成「標題 + 表格」放入同一份文件，模板只載入一次、只保存一次"""
+        try:
+            doc = Document(target_path)
+            
+            self.log_message(f"正在合併 {len(sections)} 份解析卷...")
+            
+            if not doc.tables:
+                self.log_message("警告: 目標文檔中沒有找到表格")
+                return None
+            # 以模板的第一個表格為原型，每份解析卷複製一份放在原表格的位置
+            template_table = doc.tables[0]
+            anchor = template_table._tbl
+            prototype = copy.deepcopy(anchor)
+            # 各份解析卷在不同程序中解析，沒有可對應的原始段落
+            self.explanation_fragments = {}
+            
+            total = 0
+            for title, questions in sections:
+                anchor.addprevious(self._add_section_heading(doc, title)._p)
+                tbl = copy.deepcopy(prototype)
+                anchor.addprevious(tbl)
+                self.log_message(f"填寫 {title}: {len(questions)} 題")
+                total += self._fill_table(doc, questions, Table(tbl, template_table._parent),
+                                          appendix_after_table=True) or 0
+            anchor.getparent().remove(anchor)
+            
+            doc.save(output_path)
+            
+            self.log_message(f"成功合併 {len(sections)} 份解析卷，共 {total} 個題目")
+            self.log_message(f"已保存到: {os.path.basename(output_path)}")
+            return output_path
+            
+        except Exception as e:
+            self.log_message(f"合併文檔時發生錯誤: {str(e)}")
+            return None
+    
+    def _add_section_heading(self, doc, title: str):
+        """新增分節標題，模板沒有標題樣式時改用粗體"""
+        # 先確認樣式存在：add_paragraph 會先加入段落才套用樣式，失敗時會留下多餘段落
+        try:
+            style = doc.styles['Heading 2']
+        except KeyError:
+            style = None
+        if style is not None:
+            return doc.add_paragraph(title, style=style)
+        paragraph = doc.add_paragraph()
+        run = paragraph.add_run(title)
+        run.bold = True
+        run.font.name = '標楷體'
+        return paragraph
+    
+    def _fill_table(self, doc, questions: List[Tuple[str, str, str]], table=None,
+                    appendix_after_table: bool = False) -> Optional[int]:
+        """將題目填入指定表格 (預設為文件的第一個表格)，回傳填寫題數；找不到表格時回傳 None
+
+        appendix_after_table 為 True 時，緊湊版面的解析附錄緊接在該表格之後，而非文件末尾。
+        """
+        # 尋找表格
+        if table is None:
             tables = doc.tables
             if not tables:
                 self.log_message("警告: 目標文檔中沒有找到表格")
-                return
+                return None
             table = tables[0]
-            self.log_message(f"找到表格，共 {len(table.rows)} 行，{len(table.columns)} 列")
-            required_rows = len(questions) + 1  # +1 為標題行
-            if required_rows > len(table.rows):
-                self.log_message(f"需要 {required_rows} 行，但表格只有 {len(table.rows)} 行，正在擴展表格...")
-                for _ in range(required_rows - len(table.rows)):
-                    new_row = table.add_row()
-                    for cell in new_row.cells:
-                        cell.text = ""
-                self.log_message(f"表格已擴展到 {len(table.rows)} 行")
-            filled_count = 0
+        if self.packed_layout:
+            groups = self._packed_column_groups(table)
+            if len(groups) >= 2:
+                return self._fill_packed_table(doc, table, groups, questions, appendix_after_table)
+            self.log_message("警告: 模板標題列沒有重複的「題序/答案」欄組，改用一般版面")
+        self.log_message(f"找到表格，共 {len(table.rows)} 行，{len(table.columns)} 列")
+        required_rows = len(questions) + 1  # +1 為標題行
+        if required_rows > len(table.rows):
+            self.log_message(f"需要 {required_rows} 行，但表格只有 {len(table.rows)} 行，正在擴展表格...")
+            # 新增的儲存格本來就是空的，不需逐格清空
+            for _ in range(required_rows - len(table.rows)):
+                table.add_row()
+            self.log_message(f"表格已擴展到 {len(table.rows)} 行")
+        
+        # 一次取得所有儲存格；row.cells 每次呼叫都會重建整個表格的儲存格清單
+        column_count = len(table.columns)
+        all_cells = table._cells
+        row_cells = [all_cells[r * column_count:(r + 1) * column_count] for r in range(required_rows)]
+        
+        if self.fast_layout:
+            self._apply_fast_layout(doc, table, row_cells, [len(e) for _, _, e in questions])
+        
+        filled_count = 0
+        copier = FragmentCopier(doc.part) if self.preserve_xml else None
+        try:
             for i, (question, answer, explanation) in enumerate(questions):
-                row_idx = i + 1  # 跳過標題行
-                row = table.rows[row_idx]
-                if len(row.cells) > 0:
-                    self._set_cell_text_with_font(row.cells[0], question)
+                cells = row_cells[i + 1]  # 跳過標題行
+                if len(cells) > 0:
+                    self._set_cell_text_with_font(cells[0], question)
                     self.log_message(f"填寫題序: {question}")
-                if len(row.cells) > 1:
+                if len(cells) > 1:
                     clean_answer = answer.replace('答案：', '').replace('答案:', '').strip()
-                    self._set_cell_text_with_font(row.cells[1], clean_answer)
+                    self._set_cell_text_with_font(cells[1], clean_answer)
                     self.log_message(f"填寫答案: {clean_answer}")
-                if len(row.cells) > 2:
-                    if explanation and explanation.strip():
+                if len(cells) > 2:
+                    if explanation and explanation.strip() and copier and \
+                            self._copy_explanation_fragment(copier, cells[2], question, explanation):
+                        self.log_message(f"填寫解析 (保留原始格式): {question}")
+                    elif explanation and explanation.strip():
                         clean_explanation = explanation.replace('解析：', '').replace('解析:', '').strip()
-                        self._set_cell_text_with_font(row.cells[2], clean_explanation)
+                        self._set_cell_text_with_font(cells[2], clean_explanation)
                         self.log_message(f"填寫解析: {clean_explanation[:50]}{'...' if len(clean_explanation) > 50 else ''}")
                     else:
-                        row.cells[2].text = ""
+                        cells[2].text = ""
                         self.log_message(f"題目 {question} 無解析，跳過解析欄位")
                 
                 filled_count += 1
+        finally:
+            self._cell_style = None
+        
+        return filled_count
+    
+    def _packed_column_groups(self, table) -> List[Tuple[int, int]]:
+        """從標題列找出重複的 (題序欄, 答案欄) 欄組"""
+        header = table.rows[0].cells
+        groups = []
+        column = 0
+        while column + 1 < len(header):
+            if PACKED_NUMBER_HEADER in header[column].text and PACKED_ANSWER_HEADER in header[column + 1].text:
+                groups.append((column, column + 1))
+                column += 2
+            else:
+                column += 1
+        return groups
+    
+    def _fill_packed_table(self, doc, table, groups: List[Tuple[int, int]],
+                           questions: List[Tuple[str, str, str]], appendix_after_table: bool = False) -> int:
+        """每列填入 len(groups) 題，解析另外輸出到文件末尾的附錄"""
+        per_row = len(groups)
+        data_rows = (len(questions) + per_row - 1) // per_row
+        required_rows = data_rows + 1  # +1 為標題行
+        self.log_message(f"緊湊版面: 每列 {per_row} 題，共需 {data_rows} 列")
+        if required_rows > len(table.rows):
+            for _ in range(required_rows - len(table.rows)):
+                table.add_row()
+        
+        column_count = len(table.columns)
+        all_cells = table._cells
+        row_cells = [all_cells[r * column_count:(r + 1) * column_count] for r in range(required_rows)]
+        if self.fast_layout:
+            self._apply_fast_layout(doc, table, row_cells, [0] * data_rows)
+        
+        try:
+            for i, (question, answer, _) in enumerate(questions):
+                cells = row_cells[i // per_row + 1]
+                number_column, answer_column = groups[i % per_row]
+                clean_answer = answer.replace('答案：', '').replace('答案:', '').strip()
+                self._set_cell_text_with_font(cells[number_column], question)
+                self._set_cell_text_with_font(cells[answer_column], clean_answer)
             
-            output_path = target_path.replace('.docx', '_已填寫.docx')
-            doc.save(output_path)
-            
-            self.log_message(f"成功填寫 {filled_count} 個題目")
-            self.log_message(f"已保存到: {os.path.basename(output_path)}")
-            
-        except Exception as e:
-            self.log_message(f"填寫目標文檔時發生錯誤: {str(e)}")
+            if self.packed_appendix:
+                self._add_explanation_appendix(doc, questions, table._tbl if appendix_after_table else None)
+        finally:
+            self._cell_style = None
+        
+        self.log_message(f"已填寫 {len(questions)} 題答案")
+        return len(questions)
+    
+    def _add_explanation_appendix(self, doc, questions: List[Tuple[str, str, str]], after=None):
+        """逐題列出解析，預設放在文件末尾；指定 after 元素時依序插入在它之後"""
+        explained = [(q, e) for q, _, e in questions if e and e.strip()]
+        if not explained:
+            return
+        paragraphs = [doc.add_paragraph("解析")]
+        for question, explanation in explained:
+            clean_explanation = explanation.replace('解析：', '').replace('解析:', '').strip()
+            paragraph = doc.add_paragraph()
+            run = paragraph.add_run(f"{question} {self._process_wingdings_text(clean_explanation)}")
+            run.font.name = '標楷體'
+            paragraphs.append(paragraph)
+        if after is not None:
+            for paragraph in paragraphs:
+                after.addnext(paragraph._p)
+                after = paragraph._p
+        self.log_message(f"已輸出解析附錄，共 {len(explained)} 題")
+    
+    def _apply_fast_layout(self, doc, table, row_cells, row_text_lengths: List[int]):
+        """固定表格版面：fixed 版面配置、預先計算欄寬、短列不跨頁分割、字體改由樣式提供"""
+        table.autofit = False  # 輸出 w:tblLayout w:type="fixed"
+        
+        widths = self._fast_layout_widths(doc, table, len(row_cells[0]))
+        tbl = table._tbl
+        for grid_col, width in zip(tbl.tblGrid.gridCol_lst, widths):
+            grid_col.w = width
+        self._set_table_width(tbl, Emu(sum(widths)))
+        for cells in row_cells:
+            for cell, width in zip(cells, widths):
+                cell.width = width
+        
+        # 只有內容短的列設為不跨頁，過長的列若不允許分割會留下大片空白
+        tr_list = tbl.tr_lst
+        for i, length in enumerate(row_text_lengths):
+            if length <= CANT_SPLIT_MAX_CHARS:
+                trPr = tr_list[i + 1].get_or_add_trPr()
+                if trPr.find(qn('w:cantSplit')) is None:
+                    trPr.append(OxmlElement('w:cantSplit'))
+        
+        self._cell_style = self._get_table_cell_style(doc).style_id
+        self.log_message(f"已套用快速版面，欄寬: {', '.join(str(w.twips) for w in widths)} (twips)")
+    
+    def _fast_layout_widths(self, doc, table, column_count: int) -> List[Emu]:
+        """使用模板已有的欄寬；模板沒有欄寬時依版面寬度按比例分配"""
+        grid_widths = [grid_col.w for grid_col in table._tbl.tblGrid.gridCol_lst]
+        if len(grid_widths) == column_count and all(grid_widths):
+            return [Emu(w) for w in grid_widths]
+        
+        section = doc.sections[-1]
+        usable = section.page_width - section.left_margin - section.right_margin
+        if column_count == len(FAST_LAYOUT_RATIOS):
+            ratios = FAST_LAYOUT_RATIOS
+        else:
+            ratios = [1 / column_count] * column_count
+        return [Emu(int(usable * ratio)) for ratio in ratios]
+    
+    def _set_table_width(self, tbl, width: Emu):
+        tblPr = tbl.tblPr
+        tblW = tblPr.find(qn('w:tblW'))
+        if tblW is None:
+            tblW = OxmlElement('w:tblW')
+            successor = next((tblPr.find(qn(tag)) for tag in _TBLW_SUCCESSORS
+                              if tblPr.find(qn(tag)) is not None), None)
+            if successor is not None:
+                successor.addprevious(tblW)
+            else:
+                tblPr.append(tblW)
+        tblW.set(qn('w:w'), str(width.twips))
+        tblW.set(qn('w:type'), 'dxa')
+    
+    def _get_table_cell_style(self, doc):
+        """取得或建立儲存格段落樣式，字體設定只寫一次"""
+        styles = doc.styles
+        try:
+            return styles[TABLE_CELL_STYLE]
+        except KeyError:
+            pass
+        style = styles.add_style(TABLE_CELL_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        try:
+            style.base_style = styles['Normal']
+        except KeyError:
+            pass
+        style.font.name = '標楷體'
+        return style
+    
+    def _copy_explanation_fragment(self, copier, cell, question: str, explanation: str) -> bool:
+        """以原始段落 XML 填寫解析，無法保留時回傳 False 改用純文字"""
+        fragment = getattr(self, 'explanation_fragments', {}).get(question)
+        # 只有同一次解析產生的題目才會對得上
+        if not fragment or fragment[0] != explanation:
+            return False
+        _, source_part, paragraphs = fragment
+        try:
+            copier.copy_into_cell(cell, source_part, paragraphs)
+            return True
+        except UnsupportedFragmentError as e:
+            self.log_message(f"題目 {question} 無法保留原始格式，改用純文字: {str(e)}")
+            return False
     
     def process_files(self):
-        if not self.source_file.get() or not self.target_file.get():
-            messagebox.showerror("錯誤", "請先選擇解析卷和解答卷檔案")
+        if not self.source_file.get():
+            messagebox.showerror("錯誤", "請先選擇解析卷檔案")
             return
         
         if not os.path.exists(self.source_file.get()):
             messagebox.showerror("錯誤", "解析卷檔案不存在")
             return
         
-        if not os.path.exists(self.target_file.get()):
+        # 未選擇解答卷時以內建格式產生
+        use_template = bool(self.target_file.get())
+        if use_template and not os.path.exists(self.target_file.get()):
             messagebox.showerror("錯誤", "解答卷檔案不存在")
             return
         
@@ -433,10 +1007,13 @@ class WordFormFiller:
             return
         
         # 驗證解答卷檔案格式
-        if not self.target_file.get().lower().endswith('.docx'):
+        if use_template and not self.target_file.get().lower().endswith('.docx'):
             messagebox.showerror("錯誤", "解答卷檔案必須是 .docx 格式")
             return
         
+        self.fast_layout = self.fast_layout_var.get()
+        self.packed_layout = self.packed_layout_var.get()
+        self.packed_appendix = self.packed_appendix_var.get()
         self.progress.start()
         self.status_label.config(text="正在處理...")
         self.log_text.delete(1.0, tk.END)
@@ -448,7 +1025,20 @@ class WordFormFiller:
                 messagebox.showwarning("警告", "未能從解析卷中提取到任何題目")
                 return
             
-            self.fill_target_document(self.target_file.get(), questions)
+            try:
+                chunk_size = self.chunk_size.get()
+            except tk.TclError:
+                chunk_size = 0
+            if not use_template:
+                base_name = os.path.splitext(self.source_file.get())[0]
+                if chunk_size > 0:
+                    self.generate_answer_sheet_chunked(questions, f"{base_name}_解答卷.docx", chunk_size)
+                else:
+                    self.generate_answer_sheet(questions, f"{base_name}_解答卷.docx")
+            elif chunk_size > 0:
+                self.fill_target_document_chunked(self.target_file.get(), questions, chunk_size)
+            else:
+                self.fill_target_document(self.target_file.get(), questions)
             
             self.status_label.config(text="處理完成！")
             messagebox.showinfo("完成", "檔案處理完成！請檢查輸出的檔案。")
@@ -459,8 +1049,207 @@ class WordFormFiller:
         finally:
             self.progress.stop()
             self.status_label.config(text="處理完成")
+    
+    def add_queue_files(self):
+        filenames = filedialog.askopenfilenames(
+            title="選擇解析卷檔案 (可多選)",
+            filetypes=[("Word 文檔", "*.doc"), ("所有檔案", "*.*")]
+        )
+        for filename in filenames:
+            self._add_queue_job(filename)
+    
+    def add_queue_folder(self):
+        directory = filedialog.askdirectory(title="選擇解析卷資料夾")
+        if not directory:
+            return
+        filenames = sorted(path for path in glob.glob(os.path.join(directory, '*.doc'))
+                           if not os.path.basename(path).startswith('~$'))
+        if not filenames:
+            messagebox.showwarning("警告", "資料夾中沒有 .doc 解析卷")
+            return
+        for filename in filenames:
+            self._add_queue_job(filename)
+    
+    def _add_queue_job(self, source: str):
+        # 每份解析卷與加入當下選擇的解答卷配對；未選擇時以內建格式產生
+        target = self.target_file.get()
+        if target and not os.path.exists(target):
+            messagebox.showerror("錯誤", "解答卷檔案不存在")
+            return
+        if target:
+            output = default_output_path(source, target)
+        else:
+            output = f"{os.path.splitext(source)[0]}_解答卷.docx"
+        if any(job['output'] == output for job in self.queue_jobs.values()):
+            self.log_message(f"已在佇列中: {os.path.basename(source)}")
+            return
+        item = self.queue_tree.insert('', tk.END, values=(
+            os.path.basename(source), os.path.basename(target) if target else "(內建格式)",
+            JOB_PENDING, "", output))
+        self.queue_jobs[item] = {'source': source, 'target': target, 'output': output,
+                                 'state': JOB_PENDING, 'future': None}
+    
+    def _set_job_state(self, item: str, state: str, elapsed: Optional[float] = None):
+        job = self.queue_jobs[item]
+        job['state'] = state
+        self.queue_tree.set(item, 'state', state)
+        self.queue_tree.set(item, 'elapsed', f"{elapsed:.1f} 秒" if elapsed is not None else "")
+    
+    def start_queue(self):
+        pending = [item for item, job in self.queue_jobs.items() if job['state'] == JOB_PENDING]
+        if not pending:
+            messagebox.showinfo("提示", "佇列中沒有等待處理的工作")
+            return
+        
+        options = {'fast_layout': self.fast_layout_var.get(), 'packed_layout': self.packed_layout_var.get(),
+                   'packed_appendix': self.packed_appendix_var.get()}
+        was_idle = not any(job['state'] == JOB_RUNNING for job in self.queue_jobs.values())
+        # 佇列閒置時才依目前的同時處理數重建程序池，避免中斷執行中的工作
+        if was_idle and self.executor is not None and self.executor_workers != self._queue_workers():
+            self._discard_executor()
+        for item in pending:
+            job = self.queue_jobs[item]
+            if options['packed_layout'] and not job['target']:
+                self.log_message(f"{os.path.basename(job['source'])}: 內建格式不支援緊湊答案版面，改用 題序/答案/解析 表格")
+            try:
+                job['future'] = self._submit_queue_job(job, options)
+            except Exception as e:
+                self._set_job_state(item, JOB_FAILED)
+                self.log_message(f"{os.path.basename(job['source'])}: 無法送出工作: {str(e)}")
+                continue
+            self._set_job_state(item, JOB_RUNNING)
+        self.status_label.config(text=f"佇列處理中 ({len(pending)} 份)...")
+        if was_idle:
+            self.root.after(QUEUE_POLL_MS, self._poll_queue)
+    
+    def _queue_workers(self) -> int:
+        try:
+            return max(1, self.worker_count.get())
+        except tk.TclError:
+            return 1
+    
+    def _submit_queue_job(self, job: dict, options: dict):
+        # 背景程序異常結束後程序池無法再使用，丟棄並以新的程序池重送一次
+        for attempt in range(2):
+            if self.executor is None:
+                self.executor_workers = self._queue_workers()
+                self.executor = ProcessPoolExecutor(max_workers=self.executor_workers)
+            try:
+                job['executor'] = self.executor
+                return self.executor.submit(_run_queue_job, job['source'], job['target'],
+                                            job['output'], options)
+            except BrokenProcessPool:
+                self._discard_executor()
+                if attempt:
+                    raise
+    
+    def _discard_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def _poll_queue(self):
+        running = 0
+        for item, job in list(self.queue_jobs.items()):
+            if item not in self.queue_jobs or job['state'] != JOB_RUNNING:
+                continue
+            future = job['future']
+            if not future.done():
+                running += 1
+                continue
+            try:
+                saved, error, elapsed = future.result()
+            except BrokenProcessPool:
+                # 背景程序異常結束，下次送出工作時會建立新的程序池
+                saved, error, elapsed = None, "背景程序異常結束，可重試", None
+                if job.get('executor') is self.executor:
+                    self._discard_executor()
+            except Exception as e:
+                saved, error, elapsed = None, str(e), None
+            job['future'] = None
+            job['executor'] = None
+            name = os.path.basename(job['source'])
+            if saved:
+                self._set_job_state(item, JOB_DONE, elapsed)
+                self.queue_tree.set(item, 'output', saved)
+                self._append_log(f"{name}: 已保存到 {saved}")
+            else:
+                self._set_job_state(item, JOB_FAILED, elapsed)
+                self._append_log(f"{name}: {error}")
+        
+        if running:
+            self.root.after(QUEUE_POLL_MS, self._poll_queue)
+            return
+        failed = sum(1 for job in self.queue_jobs.values() if job['state'] == JOB_FAILED)
+        done = sum(1 for job in self.queue_jobs.values() if job['state'] == JOB_DONE)
+        self.status_label.config(text=f"佇列完成：成功 {done} 份，失敗 {failed} 份")
+    
+    def retry_failed_jobs(self):
+        failed = [item for item, job in self.queue_jobs.items() if job['state'] == JOB_FAILED]
+        if not failed:
+            messagebox.showinfo("提示", "沒有失敗的工作")
+            return
+        for item in failed:
+            self._set_job_state(item, JOB_PENDING)
+        self.start_queue()
+    
+    def clear_finished_jobs(self):
+        for item in [item for item, job in self.queue_jobs.items() if job['state'] == JOB_DONE]:
+            self.queue_tree.delete(item)
+            del self.queue_jobs[item]
+    
+    def on_close(self):
+        if any(job['state'] == JOB_RUNNING for job in self.queue_jobs.values()):
+            if not messagebox.askyesno("確認", "佇列仍在處理中，確定要關閉嗎？"):
+                return
+        self._discard_executor()
+        self.root.destroy()
+
+class HeadlessWordFormFiller(WordFormFiller):
+    """不建立 Tk 視窗的填寫器，供服務、批次等無介面模式使用"""
+
+    def __init__(self, log_callback=None):
+        self.log_callback = log_callback
+
+    def log_message(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+# 每個背景程序重複使用同一個填寫器
+_queue_filler = None
+
+def _run_queue_job(source: str, target: str, output: str, options: dict) -> Tuple[Optional[str], str, float]:
+    """在背景程序中處理一份解析卷，回傳 (輸出檔案, 錯誤訊息, 耗時秒數)"""
+    global _queue_filler
+    if _queue_filler is None:
+        _queue_filler = HeadlessWordFormFiller()
+    messages = []
+    filler = _queue_filler
+    filler.log_callback = messages.append
+    filler.fast_layout = options.get('fast_layout', False)
+    filler.packed_layout = options.get('packed_layout', False)
+    filler.packed_appendix = options.get('packed_appendix', True)
+    
+    start = time.perf_counter()
+    saved = None
+    if not os.path.exists(source):
+        messages.append(f"解析卷檔案不存在: {source}")
+    elif target and not os.path.exists(target):
+        messages.append(f"解答卷檔案不存在: {target}")
+    else:
+        questions = filler.parse_source_document(source)
+        if not questions:
+            messages.append("未能從解析卷中提取到任何題目")
+        elif target:
+            saved = filler.fill_target_document(target, questions, output)
+        else:
+            saved = filler.generate_answer_sheet(questions, output)
+    error = "" if saved else (messages[-1] if messages else "處理失敗")
+    return saved, error, time.perf_counter() - start
 
 def main():
+    # 打包後的執行檔啟動背景程序時需要
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = WordFormFiller(root)
     root.mainloop()